@@ -0,0 +1,71 @@
+import subprocess
+import statistics
+import argparse
+import sys
+import os
+
+# Modules that must stay off the startup path
+HEAVY_MODULES = ("pandas", "scipy", "statsmodels")
+
+# Import one module under -X importtime
+def measure_imports(module="main"):
+    """
+    Imports `module` in a fresh interpreter and returns {module name: cumulative microseconds}.
+    Placeholder secrets are used for any unset .env values so constants.py can load.
+    """
+    env = dict(os.environ)
+    for name in ("DYDX_ADDRESS", "SECRET_PHRASE", "TELEGRAM_TOKEN", "TELEGRAM_CHAT_ID"):
+        env.setdefault(name, "bench")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+# Startup benchmark
+def bench_startup(module="main", runs=5, budget_ms=None, top=10):
+    """
+    Reports the median import time of `module` and its slowest imports. Returns 1 if any heavy
+    analytics module is imported at startup or the median exceeds budget_ms, otherwise 0.
+    """
+    samples = [measure_imports(module) for _ in range(runs)]
+    total_ms = statistics.median(sample[module] for sample in samples) / 1000
+    last = samples[-1]
+
+    print(f"import {module}: median {total_ms:.0f} ms over {runs} runs")
+    print("Slowest top-level imports (cumulative ms):")
+    ranked = sorted(((us, name) for name, us in last.items() if "." not in name and name != module), reverse=True)
+    for us, name in ranked[:top]:
+        print(f"  {us / 1000:8.1f}  {name}")
+
+    failed = False
+    heavy = [name for name in HEAVY_MODULES if name in last]
+    if len(heavy) > 0:
+        print(f"REGRESSION: {', '.join(heavy)} imported at startup")
+        failed = True
+    if budget_ms is not None and total_ms > budget_ms:
+        print(f"REGRESSION: {total_ms:.0f} ms is over the {budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return int(failed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup import time benchmark")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+    sys.exit(bench_startup(args.module, args.runs, args.budget_ms))
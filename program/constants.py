@@ -33,6 +33,21 @@ PLACE_TRADES = True
 # Resolution
 RESOLUTION = "1HOUR"
 
+# History used for cointegration (candles) and indexer page size
+HISTORY_CANDLES = 400
+CANDLES_PER_REQUEST = 100
+
+# Use the NumPy Engle-Granger test instead of statsmodels coint in the scan
+USE_FAST_COINT = True
+
+# Prefilter thresholds (absolute correlation of log returns and price levels, 0 disables)
+MIN_RETURN_CORRELATION = 0.0
+MIN_LEVEL_CORRELATION = 0.0
+
+# Cointegration scan workers (None uses every core, 1 runs serially) and pairs per task
+COINT_WORKERS = None
+COINT_CHUNK_SIZE = 32
+
 # Stats Window
 WINDOW = 21
 
@@ -42,6 +57,15 @@ ZSCORE_THRESH = 2.35
 USD_PER_TRADE = 50
 USD_MIN_COLLATERAL = 100
 
+# Track entry hedge ratios online (recursive least squares), starting from the scan's values.
+# Exits always use the hedge ratio stored on the agent at entry
+USE_ONLINE_HEDGE_RATIO = False
+HEDGE_RATIO_FORGETTING = 0.995
+HEDGE_RATIO_STATE_PATH = "hedge_ratios.json"
+
+# Submit both legs of a pair concurrently (rolling back one leg if the other fails)
+CONCURRENT_PAIR_ORDERS = True
+
 # Thresholds - Closing
 CLOSE_AT_ZSCORE_CROSS = True
 
@@ -50,6 +74,66 @@ INDEXER_ENDPOINT_TESTNET = "https://indexer.v4testnet.dydx.exchange"
 INDEXER_ENDPOINT_MAINNET = "https://indexer.dydx.trade"
 INDEXER_ACCOUNT_ENDPOINT = INDEXER_ENDPOINT_TESTNET
 
+# Stream candles and trades over the indexer WebSocket instead of polling REST candles
+STREAM_MARKET_DATA = False
+INDEXER_WS_ENDPOINT_TESTNET = "wss://indexer.v4testnet.dydx.exchange/v4/ws"
+INDEXER_WS_ENDPOINT_MAINNET = "wss://indexer.dydx.trade/v4/ws"
+
+# Indexer Rate Limits (requests per second and burst size)
+INDEXER_RATE_LIMIT = 10
+INDEXER_RATE_BURST = 10
+
+# Node Rate Limits for order and cancel submissions (per second and burst size, keep the burst at 2+ for pair legs)
+NODE_RATE_LIMIT = 5
+NODE_RATE_BURST = 4
+
+# Local candle store (SQLite) so only new candles are downloaded
+USE_CANDLE_STORE = True
+CANDLE_STORE_PATH = "candles.db"
+
+# Run as a long-lived process: retry failed cycles, handle signals, reconnect the node
+DAEMON_MODE = False
+
+# Main loop pacing: seconds between exit checks within a candle (0 = only on candle close)
+# and seconds after a candle closes before acting on it
+EXIT_CHECK_INTERVAL = 60
+CANDLE_CLOSE_DELAY = 5
+
+# Orders and pair agents (SQLite, replaces bot_agents.json)
+STATE_STORE_PATH = "bot_state.db"
+
+# Seconds before cached market metadata is refreshed
+MARKET_REGISTRY_TTL = 300
+
+# Max concurrent market downloads when constructing market prices
+MAX_CONCURRENT_REQUESTS = 8
+
+# Subaccount order pages fetched when reconciling positions (orders per page, max pages)
+ORDER_PAGE_SIZE = 100
+ORDER_PAGES_MAX = 5
+
+# Order confirmation polling (seconds between polls, blocks past good_til_block, hard timeout)
+ORDER_CONFIRM_POLL_MIN = 0.25
+ORDER_CONFIRM_POLL_MAX = 2.0
+ORDER_CONFIRM_GRACE_BLOCKS = 2
+ORDER_CONFIRM_TIMEOUT = 30
+
+# Fill tracking (seconds between polls, seconds before an unfilled order is canceled)
+FILL_POLL_MIN = 0.5
+FILL_POLL_MAX = 3.0
+FILL_TIMEOUT = 27
+
+# Block height tracking (seconds between polls, seconds before falling back to a live query, initial block time)
+BLOCK_POLL_INTERVAL = 2.0
+BLOCK_STALE_AFTER = 10.0
+BLOCK_TIME_ESTIMATE = 1.0
+
+# Telegram notifications (queue size, seconds between messages per chat, seconds to collect a digest)
+TELEGRAM_API_URL = "https://api.telegram.org"
+TELEGRAM_QUEUE_SIZE = 100
+TELEGRAM_MIN_INTERVAL = 1.0
+TELEGRAM_DIGEST_WINDOW = 2.0
+
 # Environment Variables
 DYDX_ADDRESS = config("DYDX_ADDRESS")
 SECRET_PHRASE = config("SECRET_PHRASE")
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+import websockets
+import asyncio
+import random
+import json
+
+# Fake Indexer WebSocket Server
+class FakeIndexerServer:
+    """
+    Local stand-in for the indexer WebSocket so the price stream can be run offline.
+    Answers v4_candles and v4_trades subscriptions with generated data and pushes
+    a trade and a candle update for every subscribed market every `interval` seconds.
+    Point PriceStream at it with url=f"ws://{host}:{port}".
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, interval=1.0, history=100):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.history = history
+        self.prices = {}
+
+    def price(self, market):
+        if market not in self.prices:
+            self.prices[market] = random.uniform(1, 100)
+        self.prices[market] *= 1 + random.gauss(0, 0.002)
+        return self.prices[market]
+
+    def candle(self, market, resolution, started_at):
+        return {
+            "startedAt": started_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "ticker": market,
+            "resolution": resolution,
+            "close": f"{self.price(market):.4f}",
+        }
+
+    def candle_start(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        return now.replace(minute=0, second=0, microsecond=0)
+
+    async def handler(self, websocket):
+        subscriptions = []
+        await websocket.send(json.dumps({"type": "connected", "connection_id": "fake"}))
+
+        async def push_updates():
+            while True:
+                await asyncio.sleep(self.interval)
+                now = datetime.now(timezone.utc)
+                for channel, sub_id in subscriptions:
+                    if channel == "v4_candles":
+                        market, resolution = sub_id.split("/")
+                        contents = self.candle(market, resolution, self.candle_start(now))
+                    else:
+                        market = sub_id
+                        contents = {"trades": [{
+                            "side": random.choice(["BUY", "SELL"]),
+                            "size": "1",
+                            "price": f"{self.price(market):.4f}",
+                            "createdAt": now.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                        }]}
+                    await websocket.send(json.dumps({"type": "channel_data", "channel": channel, "id": sub_id, "contents": contents}))
+
+        pusher = asyncio.ensure_future(push_updates())
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message.get("type") != "subscribe":
+                    continue
+                channel, sub_id = message["channel"], message["id"]
+                if channel == "v4_candles":
+                    market, resolution = sub_id.split("/")
+                    start = self.candle_start()
+                    candles = [self.candle(market, resolution, start - timedelta(hours=i)) for i in range(self.history)]
+                    contents = {"candles": candles}
+                else:
+                    contents = {"trades": []}
+                subscriptions.append((channel, sub_id))
+                await websocket.send(json.dumps({"type": "subscribed", "channel": channel, "id": sub_id, "contents": contents}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pusher.cancel()
+
+    async def serve_forever(self):
+        async with websockets.serve(self.handler, self.host, self.port):
+            print(f"Fake indexer WebSocket listening on ws://{self.host}:{self.port}")
+            await asyncio.Future()
+
+if __name__ == "__main__":
+    asyncio.run(FakeIndexerServer().serve_forever())
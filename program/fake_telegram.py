@@ -0,0 +1,48 @@
+from aiohttp import web
+import asyncio
+import time
+
+# Fake Telegram Server
+class FakeTelegramServer:
+    """
+    Local stand-in for the Telegram Bot API so the notifier can be run offline.
+    Records every sendMessage call and answers 429 with retry_after if a chat sends
+    more often than `min_interval` seconds. Point TelegramNotifier at it with
+    base_url=f"http://{host}:{port}".
+    """
+
+    def __init__(self, host="127.0.0.1", port=8081, min_interval=1.0):
+        self.host = host
+        self.port = port
+        self.min_interval = min_interval
+        self.messages = []
+        self.last_seen = {}
+
+    async def send_message(self, request):
+        body = await request.json()
+        chat_id = str(body["chat_id"])
+        now = time.monotonic()
+        if now - self.last_seen.get(chat_id, -self.min_interval) < self.min_interval:
+            return web.json_response({"ok": False, "error_code": 429, "parameters": {"retry_after": self.min_interval}}, status=429)
+        self.last_seen[chat_id] = now
+        self.messages.append((chat_id, body["text"]))
+        print(f"[{chat_id}] {body['text']}")
+        return web.json_response({"ok": True, "result": {"message_id": len(self.messages)}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self.send_message)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"Fake Telegram API listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def serve_forever(self):
+        await self.start()
+        await asyncio.Future()
+
+if __name__ == "__main__":
+    asyncio.run(FakeTelegramServer().serve_forever())
@@ -0,0 +1,83 @@
+from constants import BLOCK_POLL_INTERVAL, BLOCK_STALE_AFTER, BLOCK_TIME_ESTIMATE
+import asyncio
+import math
+import time
+
+# Block Height Tracker Class
+class BlockHeightTracker:
+    """
+    Keeps the chain height current from a background poll so order paths do not wait on a
+    node round trip. Between polls the height is extrapolated from the measured block time.
+    If the poll has not succeeded for `stale_after` seconds, get() queries the node directly.
+    """
+
+    def __init__(self, poll_interval=BLOCK_POLL_INTERVAL, stale_after=BLOCK_STALE_AFTER, block_time=BLOCK_TIME_ESTIMATE):
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.block_time = block_time
+        self.height = None
+        self.seen_at = None
+        self.polled_at = None
+        self.task = None
+        self.loop = None
+
+    def observe(self, height, now):
+        # Times are when each height was first seen, so their gaps track the block time
+        if self.height is not None and height <= self.height:
+            self.polled_at = now
+            return
+        if self.height is not None:
+            measured = (now - self.seen_at) / (height - self.height)
+            self.block_time = 0.8 * self.block_time + 0.2 * measured
+        self.height = height
+        self.seen_at = now
+        self.polled_at = now
+
+    def estimate(self, now):
+        # Never run more than one poll interval of blocks ahead, e.g. while the chain is halted
+        ahead = int((now - self.seen_at) / self.block_time)
+        return self.height + min(ahead, math.ceil(self.poll_interval / self.block_time))
+
+    async def fetch(self, client):
+        height = await client.node.latest_block_height()
+        self.observe(height, time.monotonic())
+        return height
+
+    async def run(self, client):
+        while True:
+            try:
+                await self.fetch(client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error polling block height: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self, client):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop or self.task is None or self.task.done():
+            self.loop = loop
+            self.task = loop.create_task(self.run(client))
+        return self.task
+
+    async def get(self, client):
+        """
+        Returns the current block height, starting the background poll on first use.
+        """
+        self.start(client)
+        now = time.monotonic()
+        if self.height is None or now - self.polled_at > self.stale_after:
+            return await self.fetch(client)
+        return self.estimate(now)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+# Shared tracker
+block_tracker = BlockHeightTracker()
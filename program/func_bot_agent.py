@@ -1,6 +1,8 @@
-from func_private import place_market_order, check_order_status, cancel_order
+from func_private import place_market_order, place_pair_orders
+from func_fill_tracker import fill_tracker
+from constants import CONCURRENT_PAIR_ORDERS
 from datetime import datetime
-from func_messaging import send_message
+from func_messaging import send_message, close_messaging
 import asyncio
 
 class BotAgent:
@@ -58,48 +60,90 @@ class BotAgent:
         }
 
     async def check_order_status_by_id(self, order_id):
-        # Allow time to process
-        await asyncio.sleep(2)  # Asynchronous wait
-
         # Ensure the order_id is valid
         if not order_id or order_id == "order_id":
             print(f"Invalid order_id: {order_id}")
             self.order_dict["pair_status"] = "ERROR"
             return "error"
 
-        # Check order status
-        try:
-            order_status = await check_order_status(self.client, order_id)
-            if not order_status:
-                raise ValueError(f"Failed to retrieve order status for order_id: {order_id}")
-        except Exception as e:
-            print(f"Error checking order status: {e}")
-            self.order_dict["pair_status"] = "ERROR"
-            return "error"
+        # Wait for the order to fill, be canceled or time out (the tracker cancels it then)
+        order_status = await fill_tracker.track(self.client, order_id)
 
         if order_status == "CANCELED":
             print(f"Order {order_id} canceled.")
             self.order_dict["pair_status"] = "FAILED"
             return "failed"
 
-        # Wait for 15 seconds to ensure order fills
-        await asyncio.sleep(25)
-        order_status = await check_order_status(self.client, order_id)
-
-        if order_status == "CANCELED":
-            print(f"Order {order_id} canceled after retry.")
-            self.order_dict["pair_status"] = "FAILED"
-            return "failed"
-
         if order_status != "FILLED":
-            await cancel_order(self.client, order_id)
             self.order_dict["pair_status"] = "ERROR"
-            print(f"Order {order_id} not filled. Cancelling order.")
             return "error"
 
         return "live"
 
+    async def open_trades_concurrently(self):
+        """
+        Submits both legs at once and checks their fills in parallel.
+        If only one leg fills, that leg is closed again. If that close fails, the pair
+        is returned as PARTIAL and an alert is sent instead of exiting.
+        """
+        print(f"Placing pair orders for {self.market_1}/{self.market_2}")
+        pair_result = await place_pair_orders(
+            self.client,
+            {"market": self.market_1, "side": self.base_side, "size": self.base_size, "price": self.base_price,
+             "failsafe_price": self.accept_failsafe_base_price},
+            {"market": self.market_2, "side": self.quote_side, "size": self.quote_size, "price": self.quote_price},
+        )
+        if pair_result["status"] == "failed":
+            print(f"Error placing pair orders: {pair_result['error']}")
+            self.order_dict["pair_status"] = "ERROR"
+            self.order_dict["comments"] = f"Error placing orders for {self.market_1}/{self.market_2}: {pair_result['error']}"
+            return self.order_dict
+
+        order_id_m1, order_id_m2 = pair_result["order_ids"]
+        order_time = datetime.now().isoformat()
+        self.order_dict["order_id_m1"] = order_id_m1
+        self.order_dict["order_time_m1"] = order_time
+        self.order_dict["order_id_m2"] = order_id_m2
+        self.order_dict["order_time_m2"] = order_time
+
+        # Check both fills in parallel
+        status_m1, status_m2 = await asyncio.gather(
+            self.check_order_status_by_id(order_id_m1),
+            self.check_order_status_by_id(order_id_m2),
+        )
+
+        if status_m1 == "live" and status_m2 == "live":
+            print("Both orders placed successfully.")
+            self.order_dict["pair_status"] = "LIVE"
+            return self.order_dict
+
+        # Close whichever leg filled on its own
+        self.order_dict["pair_status"] = "ERROR"
+        if status_m1 == "live" or status_m2 == "live":
+            market, side, size, price = (
+                (self.market_1, self.quote_side, self.base_size, self.accept_failsafe_base_price)
+                if status_m1 == "live"
+                else (self.market_2, self.base_side, self.quote_size, None)
+            )
+            failed_market = self.market_2 if status_m1 == "live" else self.market_1
+            self.order_dict["comments"] = f"Order for {failed_market} failed to fill."
+            if price is None:
+                price = self.quote_price * (1.05 if side == "BUY" else 0.95)
+            close_order_result = await place_market_order(self.client, market=market, side=side, size=size, price=price, reduce_only=True)
+            if close_order_result.get("status") == "failed":
+                # Leave the process running and flag the open leg for manual intervention
+                print(f"Error: Failed to close the {market} order.")
+                send_message(f"Critical error: Failed to close {market} order. {market} is still open, close it manually.")
+                self.order_dict["pair_status"] = "PARTIAL"
+                self.order_dict["comments"] += f" Failed to close {market}: {close_order_result.get('error')}"
+        else:
+            self.order_dict["comments"] = f"Orders for {self.market_1} and {self.market_2} failed to fill."
+        return self.order_dict
+
     async def open_trades(self):
+        if CONCURRENT_PAIR_ORDERS:
+            return await self.open_trades_concurrently()
+
         # Place first order
         print(f"Placing first order for {self.market_1}")
         try:
@@ -181,15 +225,16 @@ class BotAgent:
                     price=self.accept_failsafe_base_price,
                     reduce_only=True
                 )
-                await asyncio.sleep(2)
-                close_order_status = await check_order_status(self.client, close_order_result.get("order_id"))
+                close_order_status = await fill_tracker.track(self.client, close_order_result.get("order_id"))
                 if close_order_status != "FILLED":
                     print("Error: Failed to close the first order.")
                     send_message("Critical error: Failed to close first order.")
+                    await close_messaging()
                     exit(1)
             except Exception as e:
                 print(f"Error closing first order: {e}")
                 send_message(f"Critical error: {e}")
+                await close_messaging()
                 exit(1)
 
         print("Both orders placed successfully.")
@@ -0,0 +1,117 @@
+from constants import USE_CANDLE_STORE, CANDLE_STORE_PATH
+from func_utils import RESOLUTION_SECONDS, count_candle_starts
+from datetime import datetime, timezone, timedelta
+import sqlite3
+
+# Candle Store Class
+class CandleStore:
+    """
+    On-disk SQLite store of closed candles keyed by market, resolution and startedAt.
+    Only closed candles are stored, so anything in the store never needs to be re-downloaded.
+    """
+
+    def __init__(self, path=CANDLE_STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS candles (
+                market TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                close REAL NOT NULL,
+                PRIMARY KEY (market, resolution, started_at)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+
+    def upsert(self, market, resolution, candles):
+        """
+        Saves the closed candles from an indexer candles response. Returns the number saved.
+        """
+        last_closed = latest_closed_start(resolution)
+        rows = [
+            (market, resolution, candle["startedAt"], float(candle["close"]))
+            for candle in candles
+            if candle["startedAt"] <= last_closed
+        ]
+        if len(rows) > 0:
+            self.conn.executemany("INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+        return len(rows)
+
+    def last_started_at(self, market, resolution):
+        row = self.conn.execute(
+            "SELECT MAX(started_at) FROM candles WHERE market = ? AND resolution = ?",
+            (market, resolution),
+        ).fetchone()
+        return row[0]
+
+    def load(self, market, resolution, from_iso=None, to_iso=None, limit=None):
+        """
+        Returns (startedAt, close) tuples in ascending time order.
+        With a limit, the most recent `limit` candles are returned.
+        """
+        query = "SELECT started_at, close FROM candles WHERE market = ? AND resolution = ?"
+        params = [market, resolution]
+        if from_iso is not None:
+            query += " AND started_at >= ?"
+            params.append(from_iso)
+        if to_iso is not None:
+            query += " AND started_at <= ?"
+            params.append(to_iso)
+        query += " ORDER BY started_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self.conn.execute(query, params).fetchall()
+        rows.reverse()
+        return rows
+
+    def fetch_from(self, market, resolution, from_iso, to_iso):
+        """
+        Works out what still needs downloading for [from_iso, to_iso].
+        Returns None if every closed candle in the range is stored, the last stored startedAt
+        if the range is stored contiguously up to that point, otherwise from_iso.
+        """
+        to_iso = min(to_iso, latest_closed_start(resolution))
+        expected = count_candle_starts(from_iso, to_iso, resolution) if from_iso <= to_iso else 0
+        count, last = self.conn.execute(
+            """
+            SELECT COUNT(*), MAX(started_at) FROM candles
+            WHERE market = ? AND resolution = ? AND started_at >= ? AND started_at <= ?
+            """,
+            (market, resolution, from_iso, to_iso),
+        ).fetchone()
+        if count >= expected:
+            return None
+        if count > 0 and count >= count_candle_starts(from_iso, last, resolution):
+            return last
+        return from_iso
+
+# Start time of the most recent closed candle
+def latest_closed_start(resolution, now=None):
+    step = RESOLUTION_SECONDS[resolution]
+    now = now or datetime.now(timezone.utc)
+    current_start = int(now.timestamp()) // step * step
+    started = datetime.fromtimestamp(current_start, timezone.utc) - timedelta(seconds=step)
+    return started.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+# Check whether a candle has closed
+def is_candle_closed(started_at, resolution):
+    return started_at <= latest_closed_start(resolution)
+
+# Shared store, opened on first use
+_candle_store = None
+
+def get_candle_store():
+    """
+    Returns the shared CandleStore, or None when USE_CANDLE_STORE is disabled.
+    """
+    global _candle_store
+    if not USE_CANDLE_STORE:
+        return None
+    if _candle_store is None:
+        _candle_store = CandleStore()
+    return _candle_store
@@ -1,9 +1,16 @@
-import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-from statsmodels.tsa.stattools import coint
-from scipy.stats import linregress
-from constants import MAX_HALF_LIFE, WINDOW
+from constants import MAX_HALF_LIFE, WINDOW, COINT_WORKERS, COINT_CHUNK_SIZE, USE_FAST_COINT
+from constants import MIN_RETURN_CORRELATION, MIN_LEVEL_CORRELATION
+from func_engle_granger import engle_granger
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from collections import deque
+import time
+import os
+import re
+
+# pandas, scipy and statsmodels are imported where they are used, so that the z-score
+# helpers used by exits and entries do not load the analytics stack at startup
 
 class SmartError(Exception):
     pass
@@ -11,6 +18,7 @@ class SmartError(Exception):
 def half_life_mean_reversion(series):
     if len(series) <= 1:
         raise SmartError("Series length must be greater than 1.")
+    from scipy.stats import linregress
     difference = np.diff(series)
     lagged_series = series[:-1]
     slope, _, _, _, _ = linregress(lagged_series, difference)
@@ -21,13 +29,121 @@ def half_life_mean_reversion(series):
 
 # Calculate ZScore
 def calculate_zscore(spread):
+    import pandas as pd
     spread_series = pd.Series(spread)
     mean = spread_series.rolling(center=False, window=WINDOW).mean()
     std = spread_series.rolling(center=False, window=WINDOW).std()
-    x = spread_series.rolling(center=False, window=1).mean()
-    zscore = (x - mean) / std
+    zscore = (spread_series - mean) / std
     return zscore
 
+# Latest ZScore
+def latest_zscore(spread, window=WINDOW):
+    """
+    Returns the last value of calculate_zscore(spread) from the final `window` points only.
+    NaN if the spread is shorter than the window.
+    """
+    spread = np.asarray(spread, dtype=np.float64)
+    if len(spread) < window:
+        return np.nan
+    tail = spread[-window:]
+    std = tail.std(ddof=1)
+    return (tail[-1] - tail.mean()) / std if std > 0 else np.nan
+
+# Streaming ZScore Class
+class ZScoreStream:
+    """
+    Rolling z-score over `window` points for one spread, updated in constant time.
+    push() adds a closed value; score() returns the z-score of a provisional latest value
+    (such as the candle still in progress) against the last window - 1 closed values.
+    Sums are kept relative to the first value seen to avoid cancellation error.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.values = deque()
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, value):
+        if self.shift is None:
+            self.shift = value
+        x = value - self.shift
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.values) > self.window - 1:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+    def score(self, value):
+        if len(self.values) < self.window - 1 or self.shift is None:
+            return np.nan
+        x = value - self.shift
+        n = self.window
+        total = self.total + x
+        mean = total / n
+        var = (self.total_sq + x * x - total * mean) / (n - 1)
+        return (x - mean) / np.sqrt(var) if var > 0 else np.nan
+
+# Calculate pair statistics for every pair at once
+def calculate_pair_statistics(prices):
+    """
+    Computes the OLS hedge ratio, intercept and spread half life of every pair in a (T, N) price matrix.
+    Entry [i, j] regresses column i (base) on column j (quote). The half life of each spread
+    is taken from its lagged-level/difference moments, which are combinations of the column
+    covariance matrices, so no spread series is ever built. Returns a dict of (N, N) arrays.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    means = prices.mean(axis=0)
+    centered = prices - means
+    cov = centered.T @ centered
+
+    # Moments of lagged levels and differences for the half life regression
+    lagged = prices[:-1] - prices[:-1].mean(axis=0)
+    difference = np.diff(prices, axis=0)
+    difference -= difference.mean(axis=0)
+    cov_lag = lagged.T @ lagged
+    cov_lag_diff = lagged.T @ difference
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Hedge ratio and intercept of base on quote
+        hedge_ratio = cov / np.diag(cov)[np.newaxis, :]
+        intercept = means[:, np.newaxis] - hedge_ratio * means[np.newaxis, :]
+
+        # Spread (base - hedge_ratio * quote) lag/difference covariance and lag variance
+        b = hedge_ratio
+        lag_diff_ii = np.diag(cov_lag_diff)
+        lag_ii = np.diag(cov_lag)
+        spread_cov = (
+            lag_diff_ii[:, np.newaxis]
+            - b * (cov_lag_diff + cov_lag_diff.T)
+            + b ** 2 * lag_diff_ii[np.newaxis, :]
+        )
+        spread_var = lag_ii[:, np.newaxis] - 2 * b * cov_lag + b ** 2 * lag_ii[np.newaxis, :]
+        slope = spread_cov / spread_var
+        half_life = np.where(np.abs(slope) < np.finfo(np.float64).eps, np.nan, -np.log(2) / slope)
+
+    return {"hedge_ratio": hedge_ratio, "intercept": intercept, "half_life": half_life}
+
+# Cointegration Test
+def calculate_coint_flag(series_1, series_2):
+    """
+    Runs the Engle-Granger test and returns 1 if the pair is cointegrated at 5%, otherwise 0.
+    Uses the NumPy implementation unless USE_FAST_COINT is disabled.
+    """
+    if USE_FAST_COINT:
+        coint_res = engle_granger(series_1, series_2)
+    else:
+        from statsmodels.tsa.stattools import coint
+        coint_res = coint(series_1, series_2)
+    coint_t = coint_res[0]
+    p_value = coint_res[1]
+    critical_value = coint_res[2][1]
+    t_check = coint_t < critical_value
+    return 1 if p_value < 0.05 and t_check else 0
+
 # Calculate Cointegration
 def calculate_cointegration(series_1, series_2):
     series_1 = np.array(series_1).astype(np.float64)
@@ -42,12 +158,10 @@ def calculate_cointegration(series_1, series_2):
         return None, None, None
 
     try:
-        coint_res = coint(series_1, series_2)
-        coint_t = coint_res[0]
-        p_value = coint_res[1]
-        critical_value = coint_res[2][1]
+        coint_flag = calculate_coint_flag(series_1, series_2)
 
         # Better way to fit data vs older version
+        import statsmodels.api as sm
         series_2_with_constant = sm.add_constant(series_2) 
         model = sm.OLS(series_1, series_2_with_constant).fit()
 
@@ -61,43 +175,148 @@ def calculate_cointegration(series_1, series_2):
         spread = series_1 - (hedge_ratio * series_2) - intercept
         half_life = half_life_mean_reversion(spread)
 
-        t_check = coint_t < critical_value
-        coint_flag = 1 if p_value < 0.05 and t_check else 0
-
     except Exception as e:
         print(f"Error in cointegration calculation: {e}")
         return None, None, None
 
     return coint_flag, hedge_ratio, half_life
 
+# Cointegration flags for a list of (base, quote) column pairs
+def _coint_flags(prices, pairs):
+    flags = []
+    for i, j in pairs:
+        try:
+            flags.append(calculate_coint_flag(prices[:, i], prices[:, j]))
+        except Exception as e:
+            print(f"Error in cointegration calculation: {e}")
+            flags.append(0)
+    return flags
+
+# Price matrix shared with pool workers
+_worker_prices = None
+_worker_memory = None
+
+def _init_worker(memory_name, shape):
+    global _worker_prices, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_prices = np.ndarray(shape, dtype=np.float64, buffer=_worker_memory.buf)
+
+def _coint_flags_worker(pairs):
+    return _coint_flags(_worker_prices, pairs)
+
+# Cointegration flags, optionally across a process pool
+def calculate_coint_flags(prices, pairs, workers=COINT_WORKERS, chunk_size=COINT_CHUNK_SIZE):
+    """
+    Returns the cointegration flag of each (base, quote) column pair, in input order.
+    With more than one worker the pairs are split into chunks for a ProcessPoolExecutor and the
+    price matrix is placed in shared memory once, so tasks only carry column indexes.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(pairs) <= chunk_size:
+        return _coint_flags(prices, pairs)
+
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    memory = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=memory.buf)[:] = prices
+        chunks = [pairs[k:k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            initializer=_init_worker,
+            initargs=(memory.name, prices.shape),
+        ) as executor:
+            return [flag for flags in executor.map(_coint_flags_worker, chunks) for flag in flags]
+    finally:
+        memory.close()
+        memory.unlink()
+
+# Prefilter markets
+def prefilter_markets(df_market_prices):
+    """
+    Drops columns that cannot form meaningful pairs: merge-suffixed duplicates such as BTC-USD_x,
+    repeated column names, columns identical to an earlier column, non-positive prices and
+    constant series.
+    """
+    drop = []
+    seen = set()
+    for position, market in enumerate(df_market_prices.columns):
+        series = df_market_prices.iloc[:, position].values
+        if re.search(r"_[xy]$", str(market)) or market in seen:
+            drop.append(position)
+        elif (series <= 0).any() or np.ptp(series) == 0:
+            drop.append(position)
+        seen.add(market)
+
+    # Identical data under different names
+    kept = df_market_prices.iloc[:, [p for p in range(df_market_prices.shape[1]) if p not in drop]]
+    duplicated = kept.T.duplicated().values
+    dropped_names = [str(df_market_prices.columns[p]) for p in drop] + [str(m) for m in kept.columns[duplicated]]
+    if len(dropped_names) > 0:
+        print(f"Prefilter dropped {len(dropped_names)} markets: {dropped_names}")
+    return kept.loc[:, ~duplicated]
+
+# Correlation prefilter
+def correlation_mask(prices, min_return_corr=MIN_RETURN_CORRELATION, min_level_corr=MIN_LEVEL_CORRELATION):
+    """
+    Returns an (N, N) boolean mask of pairs whose absolute log return and price level
+    correlations both reach the thresholds. A threshold of 0 skips that check.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    mask = np.ones((prices.shape[1], prices.shape[1]), dtype=bool)
+    if min_return_corr > 0:
+        mask &= np.abs(np.corrcoef(np.diff(np.log(prices), axis=0), rowvar=False)) >= min_return_corr
+    if min_level_corr > 0:
+        mask &= np.abs(np.corrcoef(prices, rowvar=False)) >= min_level_corr
+    return mask
+
 # Store Cointegration Results
-def store_cointegration_results(df_market_prices):
+def store_cointegration_results(df_market_prices, workers=COINT_WORKERS):
     # Initialize
+    n_markets = df_market_prices.shape[1]
+    total_pairs = n_markets * (n_markets - 1) // 2
+    start_time = time.perf_counter()
+    df_market_prices = prefilter_markets(df_market_prices)
     markets = df_market_prices.columns.to_list()
+    prices = df_market_prices.values.astype(np.float64)
     criteria_met_pairs = []
+    base_idx, quote_idx = np.triu_indices(len(markets), k=1)
+
+    # Correlation prefilter
+    correlated = correlation_mask(prices)[base_idx, quote_idx]
 
-    # Find cointegrated pairs
-    # Start with our base pair
-    for index, base_market in enumerate(markets[:-1]):
-        series_1 = df_market_prices[base_market].values.astype(np.float64).tolist()
+    # Hedge ratio and half life for every pair in one pass
+    stats = calculate_pair_statistics(prices)
+    half_lives = stats["half_life"][base_idx, quote_idx]
+    half_life_ok = np.isfinite(half_lives) & (half_lives > 0) & (half_lives <= MAX_HALF_LIFE)
+    candidates = np.flatnonzero(correlated & half_life_ok)
+    prefilter_time = time.perf_counter() - start_time
 
-        # Get Quote Pair
-        for quote_market in markets[index + 1:]:
-            series_2 = df_market_prices[quote_market].values.astype(np.float64).tolist()
+    print(f"Pairs: {total_pairs} total, {total_pairs - len(base_idx)} pruned by market filter, "
+          f"{int((~correlated).sum())} by correlation, {int((correlated & ~half_life_ok).sum())} by half life, "
+          f"{len(candidates)} left to test ({prefilter_time:.3f}s)")
 
-            # Check cointegration
-            coint_flag, hedge_ratio, half_life = calculate_cointegration(series_1, series_2)
+    # Find cointegrated pairs among candidates
+    start_time = time.perf_counter()
+    pairs = [(int(base_idx[k]), int(quote_idx[k])) for k in candidates]
+    coint_flags = calculate_coint_flags(prices, pairs, workers)
+    coint_time = time.perf_counter() - start_time
+    print(f"Cointegration tests for {len(pairs)} pairs completed in {coint_time:.3f}s")
+    if len(pairs) > 0:
+        saved = (total_pairs - len(pairs)) * coint_time / len(pairs) - prefilter_time
+        print(f"Prefilter saved an estimated {saved:.1f}s of cointegration tests")
 
-            # Log pair
-            if coint_flag == 1 and half_life is not None and half_life <= MAX_HALF_LIFE and half_life > 0:
-                criteria_met_pairs.append({
-                    "base_market": base_market,
-                    "quote_market": quote_market,
-                    "hedge_ratio": hedge_ratio,
-                    "half_life": half_life,
-                })
+    for k, (i, j), coint_flag in zip(candidates, pairs, coint_flags):
+        # Log pair
+        if coint_flag == 1:
+            criteria_met_pairs.append({
+                "base_market": markets[i],
+                "quote_market": markets[j],
+                "hedge_ratio": stats["hedge_ratio"][i, j],
+                "half_life": half_lives[k],
+            })
 
     # Create and save DataFrame
+    import pandas as pd
     df_criteria_met = pd.DataFrame(criteria_met_pairs)
     df_criteria_met.to_csv("cointegrated_pairs.csv")
     del df_criteria_met
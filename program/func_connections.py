@@ -3,6 +3,7 @@ from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
 from dydx_v4_client.network import TESTNET
 from constants import INDEXER_ACCOUNT_ENDPOINT, INDEXER_ENDPOINT_MAINNET, MNEMONIC, DYDX_ADDRESS, MARKET_DATA_MODE
 from func_public import get_candles_recent
+import asyncio
 
 # Client Class
 class Client:
@@ -11,6 +12,7 @@ class Client:
         self.indexer_account = indexer_account
         self.node = node
         self.wallet = wallet
+        self.price_stream = None
 
 # Connect to DYDX
 async def connect_dydx():
@@ -38,6 +40,36 @@ async def connect_dydx():
         print(f"Error connecting to dYdX: {e}")
         return None
 
+# Reconnect Node
+async def reconnect_node(client, max_backoff=60):
+    """
+    Replaces the client's node connection and wallet, retrying with exponential backoff.
+    """
+    backoff = 1
+    while True:
+        try:
+            node = await NodeClient.connect(TESTNET.node)
+            wallet = await Wallet.from_mnemonic(node, MNEMONIC, DYDX_ADDRESS)
+            client.node = node
+            client.wallet = wallet
+            print("Node reconnected successfully.")
+            return client
+        except Exception as e:
+            print(f"Error reconnecting to node: {e}. Retrying in {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+# Ensure Node Connection
+async def ensure_node(client):
+    """
+    Checks the node connection with a block height query and reconnects if it fails.
+    """
+    try:
+        await client.node.latest_block_height()
+    except Exception as e:
+        print(f"Node connection lost: {e}")
+        await reconnect_node(client)
+
 # Check Jurisdiction
 async def check_jurisdiction(client, market):
     """
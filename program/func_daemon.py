@@ -0,0 +1,124 @@
+from func_markets import market_registry
+from func_hedge_ratio import hedge_book
+from func_block_height import block_tracker
+from func_state_store import get_state_store
+from func_public import clear_candles_cache
+from func_messaging import send_message
+import constants
+import importlib
+import asyncio
+import signal
+import sys
+
+# Daemon Class
+class Daemon:
+    """
+    Signal handling for running main.py as a long-lived process.
+    SIGINT/SIGTERM ask the loop to stop once in-flight orders are done (a second signal
+    cancels straight away) and SIGHUP asks it to reload constants between cycles.
+    """
+
+    def __init__(self):
+        self.stop_event = None
+        self.reload_requested = False
+        self.main_task = None
+
+    def install(self):
+        loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        self.main_task = asyncio.current_task()
+        handlers = [(signal.SIGINT, self.request_stop), (signal.SIGTERM, self.request_stop)]
+        if hasattr(signal, "SIGHUP"):
+            handlers.append((signal.SIGHUP, self.request_reload))
+        for sig, handler in handlers:
+            try:
+                loop.add_signal_handler(sig, handler)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+
+    def request_stop(self):
+        if self.stop_event.is_set():
+            print("Second stop signal received. Exiting now.")
+            self.main_task.cancel()
+            return
+        print("Stop requested. Finishing in-flight orders before exiting...")
+        self.stop_event.set()
+
+    def request_reload(self):
+        print("Reload requested. Constants will be reloaded after this cycle.")
+        self.reload_requested = True
+
+    def stopping(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    async def unless_stopped(self, awaitable):
+        """
+        Awaits `awaitable` unless a stop is requested first. Returns (finished, result).
+        """
+        task = asyncio.ensure_future(awaitable)
+        if self.stop_event is None:
+            return True, await task
+        stop = asyncio.ensure_future(self.stop_event.wait())
+        await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if task.done():
+            return True, task.result()
+        task.cancel()
+        return False, None
+
+# Reload constants
+def reload_constants():
+    """
+    Re-executes constants.py and pushes changed values into every bot module that imported
+    them by name. Values already bound as defaults or held by running objects, and the .env
+    secrets, keep their start-up values until restart. Returns the names that changed.
+    If constants.py fails to load, the old values are kept and the error is reported.
+    """
+    old = {name: getattr(constants, name) for name in dir(constants) if name.isupper()}
+    saved = dict(vars(constants))
+    try:
+        importlib.reload(constants)
+    except Exception as e:
+        # A failed reload can leave the module half re-executed, so put every name back
+        vars(constants).clear()
+        vars(constants).update(saved)
+        print(f"Error reloading constants, keeping the current values: {e}")
+        send_message(f"Error reloading constants, keeping the current values: {e}")
+        return []
+    changed = [name for name in old if getattr(constants, name, None) != old[name]]
+
+    for module in list(sys.modules.values()):
+        name = getattr(module, "__name__", "")
+        if module is constants or not (name.startswith("func_") or name == "__main__"):
+            continue
+        for constant in changed:
+            if constant in vars(module):
+                setattr(module, constant, getattr(constants, constant))
+
+    # Cached data may depend on the old settings
+    clear_candles_cache()
+    market_registry.updated = None
+    print(f"Reloaded constants. Changed: {', '.join(changed) if changed else 'none'}")
+    return changed
+
+# Warm up caches
+async def warm_up(client):
+    """
+    Loads state and starts background trackers once so the first cycle pays no start-up cost.
+    """
+    get_state_store()
+    hedge_book.load()
+    block_tracker.start(client)
+    await market_registry.ensure_fresh(client)
+
+# Shut down
+async def shut_down(client):
+    if client.price_stream is not None:
+        await client.price_stream.stop()
+    await block_tracker.stop()
+    hedge_book.save()
+    get_state_store().compact()
+    print("Shutdown complete")
+
+# Shared daemon
+daemon = Daemon()
@@ -0,0 +1,169 @@
+import numpy as np
+import math
+
+# MacKinnon (1994) p-value surface for the Engle-Granger test with a constant and two I(1) series,
+# as used by statsmodels.tsa.stattools.coint (tau_c, N=2). Coefficients are low to high order.
+TAU_MAX = 0.92
+TAU_MIN = -18.86
+TAU_STAR = -2.62
+TAU_SMALLP = (2.92, 1.5012, 0.039796)
+TAU_LARGEP = (2.1945, 0.64695, -0.29198, -0.042377)
+
+# MacKinnon (2010) critical value response surfaces (1%, 5%, 10%) for the same case
+TAU_CRIT = (
+    (-3.89644, -10.9519, -33.527, 0.0),
+    (-3.33613, -6.1101, -6.823, 0.0),
+    (-3.04445, -4.2412, -2.720, 0.0),
+)
+
+# Collinearity cut-off used by statsmodels
+SQRTEPS = np.sqrt(np.finfo(np.float64).eps)
+
+# Polynomial with coefficients from low to high order
+def _polyval(coefs, x):
+    return sum(c * x ** k for k, c in enumerate(coefs))
+
+# MacKinnon approximate p-value
+def mackinnon_pvalue(stat):
+    if stat > TAU_MAX:
+        return 1.0
+    if stat < TAU_MIN:
+        return 0.0
+    coefs = TAU_SMALLP if stat <= TAU_STAR else TAU_LARGEP
+    return 0.5 * math.erfc(-_polyval(coefs, stat) / math.sqrt(2))
+
+# MacKinnon critical values (1%, 5%, 10%)
+def mackinnon_critical_values(nobs):
+    return np.array([_polyval(coefs, 1.0 / nobs) for coefs in TAU_CRIT])
+
+# Lagged ADF design
+def _adf_design(resid, lags):
+    """
+    Returns (y, X) for the no-constant ADF regression of diff(resid) on the lagged level
+    and `lags` lagged differences, trimmed to the rows where every lag exists.
+    """
+    xdiff = np.diff(resid)
+    nobs = len(xdiff) - lags
+    X = np.empty((nobs, lags + 1))
+    X[:, 0] = resid[-nobs - 1:-1]
+    for lag in range(1, lags + 1):
+        X[:, lag] = xdiff[lags - lag:len(xdiff) - lag]
+    return xdiff[-nobs:], X
+
+# ADF t-statistic on residuals
+def adf_statistic(resid, lags=None):
+    """
+    Residual-based ADF t-statistic with no deterministic terms.
+    With lags=None the lag length is chosen by AIC over 0..maxlag (Schwert rule), matching
+    statsmodels adfuller(autolag="aic"). Every candidate lag is fitted from one cross-product
+    matrix of the widest design instead of a separate regression per lag.
+    """
+    resid = np.asarray(resid, dtype=np.float64)
+    if lags is None:
+        nobs = len(resid)
+        maxlag = min(nobs // 2 - 1, int(np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0))))
+        y, X = _adf_design(resid, maxlag)
+        XtX = X.T @ X
+        Xty = X.T @ y
+        yty = y @ y
+        n = len(y)
+
+        best = None
+        for k in range(1, maxlag + 2):
+            beta = np.linalg.solve(XtX[:k, :k], Xty[:k])
+            ssr = yty - beta @ Xty[:k]
+            aic = n * (np.log(2 * np.pi) + np.log(ssr / n) + 1) + 2 * k
+            if best is None or aic < best[0]:
+                best = (aic, k - 1)
+        lags = best[1]
+
+    # Final regression with the chosen lags
+    y, X = _adf_design(resid, lags)
+    XtX_inv = np.linalg.inv(X.T @ X)
+    beta = XtX_inv @ (X.T @ y)
+    residuals = y - X @ beta
+    sigma2 = residuals @ residuals / (len(y) - X.shape[1])
+    return beta[0] / np.sqrt(sigma2 * XtX_inv[0, 0])
+
+# Engle-Granger cointegration test
+def engle_granger(series_1, series_2, lags=None):
+    """
+    Lean NumPy version of statsmodels coint(series_1, series_2) with a constant.
+    Returns (t-statistic, p-value, critical values at 1%, 5% and 10%).
+    """
+    y = np.asarray(series_1, dtype=np.float64)
+    x = np.asarray(series_2, dtype=np.float64)
+    nobs = len(y)
+
+    # OLS of series_1 on series_2 and a constant
+    X = np.column_stack((x, np.ones(nobs)))
+    beta, _, _, _ = np.linalg.lstsq(X, y, rcond=None)
+    resid = y - X @ beta
+    centered = y - y.mean()
+    rsquared = 1 - (resid @ resid) / (centered @ centered)
+
+    # Perfectly collinear series are treated as cointegrated, as statsmodels does
+    if rsquared < 1 - 100 * SQRTEPS:
+        stat = adf_statistic(resid, lags)
+    else:
+        stat = -np.inf
+
+    return stat, mackinnon_pvalue(stat), mackinnon_critical_values(nobs - 1)
+
+# Parity check and benchmark against statsmodels
+def compare_with_statsmodels(pairs_path="cointegrated_pairs.csv", history=400):
+    """
+    Runs both implementations on the pairs in cointegrated_pairs.csv using closes from the
+    candle store and reports the largest differences and the per-pair timings.
+    """
+    from statsmodels.tsa.stattools import coint
+    from func_candle_store import get_candle_store
+    from constants import RESOLUTION
+    import pandas as pd
+    import time
+
+    store = get_candle_store()
+    pairs = pd.read_csv(pairs_path)
+    closes = {}
+    for market in set(pairs["base_market"]) | set(pairs["quote_market"]):
+        rows = store.load(market, RESOLUTION, limit=history) if store is not None else []
+        closes[market] = dict(rows)
+
+    max_stat_diff = max_p_diff = 0.0
+    mismatched_flags = tested = 0
+    time_fast = time_statsmodels = 0.0
+    for _, row in pairs.iterrows():
+        base, quote = closes[row["base_market"]], closes[row["quote_market"]]
+        common = sorted(set(base) & set(quote))
+        if len(common) < 50:
+            continue
+        series_1 = np.array([base[t] for t in common])
+        series_2 = np.array([quote[t] for t in common])
+
+        start = time.perf_counter()
+        fast = engle_granger(series_1, series_2)
+        time_fast += time.perf_counter() - start
+        start = time.perf_counter()
+        reference = coint(series_1, series_2)
+        time_statsmodels += time.perf_counter() - start
+
+        tested += 1
+        if np.isfinite(reference[0]):
+            max_stat_diff = max(max_stat_diff, abs(fast[0] - reference[0]))
+        max_p_diff = max(max_p_diff, abs(fast[1] - reference[1]))
+        fast_flag = fast[1] < 0.05 and fast[0] < fast[2][1]
+        reference_flag = reference[1] < 0.05 and reference[0] < reference[2][1]
+        mismatched_flags += int(fast_flag != reference_flag)
+
+    if tested == 0:
+        print("No stored candles for the pairs in cointegrated_pairs.csv. Run FIND_COINTEGRATED first.")
+        return None
+
+    print(f"Pairs tested: {tested}, flag mismatches: {mismatched_flags}")
+    print(f"Max |t-stat| difference: {max_stat_diff:.2e}, max |p-value| difference: {max_p_diff:.2e}")
+    print(f"Per pair: numpy {time_fast / tested * 1e3:.3f} ms, statsmodels {time_statsmodels / tested * 1e3:.3f} ms, "
+          f"speedup {time_statsmodels / max(time_fast, 1e-12):.1f}x")
+    return {"tested": tested, "mismatched_flags": mismatched_flags, "max_stat_diff": max_stat_diff, "max_p_diff": max_p_diff}
+
+if __name__ == "__main__":
+    compare_with_statsmodels()
@@ -1,10 +1,11 @@
-from constants import ZSCORE_THRESH, USD_PER_TRADE, USD_MIN_COLLATERAL, TRADE_SPECIFIC_PAIRS, SPECIFIC_PAIRS
-from func_utils import format_number
-from func_cointegration import calculate_zscore
-from func_public import get_candles_recent
-from func_private import get_open_positions, get_account, place_market_order
-import pandas as pd
-import json
+from constants import USD_PER_TRADE, USD_MIN_COLLATERAL, TRADE_SPECIFIC_PAIRS, SPECIFIC_PAIRS, USE_ONLINE_HEDGE_RATIO
+from constants import CONCURRENT_PAIR_ORDERS
+from func_signals import evaluate_pair_signals
+from func_private import get_open_positions, get_account, place_market_order, place_pair_orders
+from func_markets import market_registry
+from func_hedge_ratio import hedge_book
+from func_state_store import get_state_store
+from func_daemon import daemon
 
 IGNORE_ASSETS = ["BTC-USD_x", "BTC-USD_y"]
 
@@ -16,8 +17,8 @@ async def is_market_open(client, market):
 # Fetch market data directly
 async def fetch_market_data(client, market):
     try:
-        response = await client.indexer.markets.get_perpetual_markets()
-        return response["markets"].get(market, None)
+        markets = await market_registry.get_markets(client)
+        return markets.get(market, None)
     except Exception as e:
         print(f"Error fetching market data for {market}: {e}")
         return None
@@ -29,103 +30,105 @@ async def open_positions(client):
     Store trades for managing later on for the exit function.
     """
 
-    # Load cointegrated pairs
+    # Load cointegrated pairs (pandas is only needed once entries run)
+    import pandas as pd
     df = pd.read_csv("cointegrated_pairs.csv")
 
-    bot_agents = []
-
-    # Load existing bot agents from JSON
-    try:
-        with open("bot_agents.json", "r") as open_positions_file:
-            open_positions_dict = json.load(open_positions_file)
-            for p in open_positions_dict:
-                bot_agents.append(p)
-    except FileNotFoundError:
-        bot_agents = []
-
     # Get all available markets from the exchange
-    markets_response = await client.indexer.markets.get_perpetual_markets()
-    available_markets = markets_response["markets"].keys()
-
-    # Loop through pairs to find opportunities
-    for _, row in df.iterrows():
-        base_market = row["base_market"]
-        quote_market = row["quote_market"]
-
-        # Skip invalid or unavailable markets
-        if base_market not in available_markets or quote_market not in available_markets:
-            print(f"Skipping invalid or unavailable market pair: {base_market}/{quote_market}")
-            continue
-
-        hedge_ratio = row["hedge_ratio"]
-        half_life = row["half_life"]
-
-        try:
-            series_1 = await get_candles_recent(client, base_market)
-            series_2 = await get_candles_recent(client, quote_market)
-        except Exception as e:
-            print(f"Error fetching prices: {e}")
+    available_markets = (await market_registry.get_markets(client)).keys()
+
+    # Evaluate every pair at once and walk the ranked signals
+    candidates = await evaluate_pair_signals(client, df, available_markets)
+
+    for candidate in candidates:
+        # Stop opening new pairs once shutdown is requested
+        if daemon.stopping():
+            print("Shutdown requested. No further trades will be opened.")
+            break
+
+        base_market = candidate["base_market"]
+        quote_market = candidate["quote_market"]
+        hedge_ratio = candidate["hedge_ratio"]
+        half_life = candidate["half_life"]
+        z_score = candidate["z_score"]
+
+        base_side = "BUY" if z_score < 0 else "SELL"
+        quote_side = "BUY" if z_score > 0 else "SELL"
+
+        base_price = candidate["base_price"]
+        quote_price = candidate["quote_price"]
+        # Round sizes to each market's step size, as the exchange requires
+        base_size = market_registry.format_size(base_market, 1 / base_price * USD_PER_TRADE)
+        quote_size = market_registry.format_size(quote_market, 1 / quote_price * USD_PER_TRADE)
+        if float(base_size) == 0 or float(quote_size) == 0:
+            print(f"Trade size for {base_market}/{quote_market} is below the step size. Skipping...")
             continue
 
-        if len(series_1) > 0 and len(series_1) == len(series_2):
-            spread = series_1 - (hedge_ratio * series_2)
-            z_score = calculate_zscore(spread).values.tolist()[-1]
-
-            if abs(z_score) >= ZSCORE_THRESH:
-                base_side = "BUY" if z_score < 0 else "SELL"
-                quote_side = "BUY" if z_score > 0 else "SELL"
-
-                base_price = series_1[-1]
-                quote_price = series_2[-1]
-                base_size = 1 / base_price * USD_PER_TRADE
-                quote_size = 1 / quote_price * USD_PER_TRADE
-
-                # Check account balance
-                account = await get_account(client)
-                free_collateral = float(account["freeCollateral"])
-                print(f"Balance: {free_collateral} and minimum at {USD_MIN_COLLATERAL}")
-
-                if free_collateral < USD_MIN_COLLATERAL:
-                    print("Insufficient collateral to place the trade.")
-                    break
-
-                # Place the base order
-                base_order_result = await place_market_order(client, base_market, base_side, base_size, base_price, False)
-                if base_order_result["status"] == "failed":
-                    print(f"Error placing base order: {base_order_result['error']}")
-                    continue
-                else:
-                    print(f"First order placed successfully for {base_market}: {base_order_result['order_id']}")
-
-                # Place the quote order
-                quote_order_result = await place_market_order(client, quote_market, quote_side, quote_size, quote_price, False)
-                if quote_order_result["status"] == "failed":
-                    print(f"Error placing quote order: {quote_order_result['error']}")
-                    continue
-                else:
-                    print(f"Second order placed successfully for {quote_market}: {quote_order_result['order_id']}")
-
-                # Create Bot Agent
-                bot_agent = {
-                    "market_1": base_market,
-                    "market_2": quote_market,
-                    "order_id_m1": base_order_result['order_id'],
-                    "order_id_m2": quote_order_result['order_id'],
-                    "order_m1_size": base_size,
-                    "order_m2_size": quote_size,
-                    "order_m1_side": base_side,
-                    "order_m2_side": quote_side,
-                    "price_m1": base_price,  # Save price for market_1
-                    "price_m2": quote_price,  # Save price for market_2
-                    "hedge_ratio": hedge_ratio,
-                    "z_score": z_score,
-                    "half_life": half_life,
-                    "pair_status": "LIVE"
-                }
-
-                # Append bot agent and save
-                bot_agents.append(bot_agent)
-                with open("bot_agents.json", "w") as f:
-                    json.dump(bot_agents, f)
-
-                print("Trade opened successfully.")
+        # Check account balance
+        account = await get_account(client)
+        free_collateral = float(account["freeCollateral"])
+        print(f"Balance: {free_collateral} and minimum at {USD_MIN_COLLATERAL}")
+
+        if free_collateral < USD_MIN_COLLATERAL:
+            print("Insufficient collateral to place the trade.")
+            break
+
+        # Place both legs concurrently, rolling back if one fails
+        if CONCURRENT_PAIR_ORDERS:
+            pair_result = await place_pair_orders(
+                client,
+                {"market": base_market, "side": base_side, "size": base_size, "price": base_price},
+                {"market": quote_market, "side": quote_side, "size": quote_size, "price": quote_price},
+            )
+            if pair_result["status"] == "failed":
+                print(f"Error placing pair orders: {pair_result['error']}")
+                continue
+            order_id_m1, order_id_m2 = pair_result["order_ids"]
+            print(f"Pair orders placed successfully for {base_market}/{quote_market}: {order_id_m1}, {order_id_m2}")
+
+        else:
+            # Place the base order
+            base_order_result = await place_market_order(client, base_market, base_side, base_size, base_price, False)
+            if base_order_result["status"] == "failed":
+                print(f"Error placing base order: {base_order_result['error']}")
+                continue
+            else:
+                print(f"First order placed successfully for {base_market}: {base_order_result['order_id']}")
+
+            # Place the quote order
+            quote_order_result = await place_market_order(client, quote_market, quote_side, quote_size, quote_price, False)
+            if quote_order_result["status"] == "failed":
+                print(f"Error placing quote order: {quote_order_result['error']}")
+                continue
+            else:
+                print(f"Second order placed successfully for {quote_market}: {quote_order_result['order_id']}")
+
+            order_id_m1 = base_order_result['order_id']
+            order_id_m2 = quote_order_result['order_id']
+
+        # Create Bot Agent
+        bot_agent = {
+            "market_1": base_market,
+            "market_2": quote_market,
+            "order_id_m1": order_id_m1,
+            "order_id_m2": order_id_m2,
+            "order_m1_size": base_size,
+            "order_m2_size": quote_size,
+            "order_m1_side": base_side,
+            "order_m2_side": quote_side,
+            "price_m1": base_price,  # Save price for market_1
+            "price_m2": quote_price,  # Save price for market_2
+            "hedge_ratio": hedge_ratio,
+            "z_score": z_score,
+            "half_life": half_life,
+            "pair_status": "LIVE"
+        }
+
+        # Save bot agent
+        get_state_store().add_agent(bot_agent)
+
+        print("Trade opened successfully.")
+
+    # Save hedge ratio state
+    if USE_ONLINE_HEDGE_RATIO:
+        hedge_book.save()
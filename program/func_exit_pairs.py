@@ -1,175 +1,176 @@
 from constants import CLOSE_AT_ZSCORE_CROSS
-from func_utils import format_number
-from func_cointegration import calculate_zscore
-from func_private import place_market_order, get_open_positions, get_order
-from func_public import get_candles_recent, get_markets
-import json
+from func_private import place_market_order, get_open_positions, get_orders_by_id
+from func_signals import fetch_recent_prices, zscore_book
+from func_markets import market_registry
+from func_state_store import get_state_store
+from func_messaging import send_message
+import asyncio
 import time
 import numpy as np
 
-# Manage trade exits
-async def manage_trade_exits(client):
+# Reconcile positions
+async def reconcile_positions(client, positions):
     """
-    Manage exiting open positions based upon criteria set in constants.
-    Handles both pair-based and single-market positions.
+    Checks saved pair positions against the exchange using one bulk order lookup and one
+    account query. Returns (unconfirmed positions to keep, [(position, order_m1, order_m2)]).
     """
+    keep = []
+    ready = []
 
-    # Initialize saving output
-    save_output = []
+    # Index every order referenced by a position and the markets with live positions
+    order_ids = [position.get(key) for position in positions for key in ("order_id_m1", "order_id_m2")]
+    orders, exchange_pos = await asyncio.gather(get_orders_by_id(client, order_ids), get_open_positions(client))
+    markets_live = set(exchange_pos.keys())
 
-    # Open JSON file containing open positions
-    try:
-        with open("bot_agents.json", "r") as open_positions_file:
-            open_positions_dict = json.load(open_positions_file)
-    except FileNotFoundError:
-        print("Error: bot_agents.json not found")
-        return "complete"
+    for position in positions:
+        market_m1 = position.get("market_1")
+        market_m2 = position.get("market_2")
 
-    # Guard: Exit if no open positions in file
-    if len(open_positions_dict) < 1:
-        print("No open positions in bot_agents.json")
-        return "complete"
+        # Safeguard if any order_id_m1 or order_id_m2 is missing
+        if not position.get("order_id_m1") or not position.get("order_id_m2"):
+            print(f"Error: Missing order_id in position for {market_m1}/{market_m2}. Skipping...")
+            keep.append(position)
+            continue
 
-    # Get all open positions from the trading platform
-    exchange_pos = await get_open_positions(client)
+        # Guard: Orders must exist on the exchange
+        order_m1 = orders.get(position["order_id_m1"])
+        order_m2 = orders.get(position["order_id_m2"])
+        if order_m1 is None or order_m2 is None:
+            missing = position["order_id_m1"] if order_m1 is None else position["order_id_m2"]
+            print(f"Order {missing} for {market_m1}/{market_m2} not found. Skipping...")
+            keep.append(position)
+            continue
 
-    # Create live position tickers list
-    markets_live = list(exchange_pos.keys())
+        # Check if positions match exchange and live data
+        check_m1 = market_m1 == order_m1.get("ticker") and position.get("order_m1_side") == order_m1.get("side")
+        check_m2 = market_m2 == order_m2.get("ticker") and position.get("order_m2_side") == order_m2.get("side")
+        check_live = market_m1 in markets_live and market_m2 in markets_live
 
-    # Protect API rate limit
-    time.sleep(0.5)
+        # Guard: If not all match, skip the exit
+        if not check_m1 or not check_m2 or not check_live:
+            print(f"Warning: Open positions for {market_m1} and {market_m2} do not match exchange records. Skipping...")
+            keep.append(position)
+            continue
 
-    # Iterate over all positions and process exits
-    for position in open_positions_dict:
-        is_close = False
+        ready.append((position, order_m1, order_m2))
 
-        # Extract position information from file for market 1 and market 2
-        position_market_m1 = position.get("market_1")
-        position_size_m1 = position.get("order_m1_size")
-        position_side_m1 = position.get("order_m1_side")
-        position_market_m2 = position.get("market_2")
-        position_size_m2 = position.get("order_m2_size")
-        position_side_m2 = position.get("order_m2_side")
+    return keep, ready
 
-        # Safeguard if any order_id_m1 or order_id_m2 is missing
-        if "order_id_m1" not in position or "order_id_m2" not in position:
-            print(f"Error: Missing order_id in position for {position_market_m1}/{position_market_m2}. Skipping...")
-            save_output.append(position)
-            continue
+# Evaluate exits
+async def evaluate_exits(client, positions_ready):
+    """
+    Computes the current z-score of every reconciled position from one shared price fetch.
+    Returns (closes to submit as (position, order_m1, order_m2, price_m1, price_m2), positions to keep).
+    """
+    start_time = time.perf_counter()
+    markets = [position["market_1"] for position, _, _ in positions_ready] + [position["market_2"] for position, _, _ in positions_ready]
+    columns, prices = await fetch_recent_prices(client, markets)
+
+    to_close = []
+    to_keep = []
+    priced = []
+    for item in positions_ready:
+        position = item[0]
+        if position["market_1"] in columns and position["market_2"] in columns:
+            priced.append(item)
+        else:
+            print(f"No price data for {position['market_1']}/{position['market_2']}. Skipping...")
+            to_keep.append(position)
+    if len(priced) == 0:
+        return to_close, to_keep
+
+    idx_1 = np.array([columns[position["market_1"]] for position, _, _ in priced])
+    idx_2 = np.array([columns[position["market_2"]] for position, _, _ in priced])
+    # Judge each position on the hedge ratio its entry z-score was computed with
+    hedge_ratios = np.array([position["hedge_ratio"] for position, _, _ in priced], dtype=np.float64)
+
+    # Latest z-score of every spread from its streamed window
+    market_pairs = [(position["market_1"], position["market_2"]) for position, _, _ in priced]
+    z_scores = zscore_book.scores(client, market_pairs, hedge_ratios, prices[:, idx_1] - hedge_ratios * prices[:, idx_2])
+
+    for k, (position, order_m1, order_m2) in enumerate(priced):
+        z_score_current = z_scores[k]
+        z_score_traded = position["z_score"]
+
+        # Determine if Z-score conditions trigger an exit
+        z_score_level_check = abs(z_score_current) >= abs(z_score_traded)
+        z_score_cross_check = (z_score_current < 0 and z_score_traded > 0) or (z_score_current > 0 and z_score_traded < 0)
+
+        if z_score_level_check and z_score_cross_check:
+            to_close.append((position, order_m1, order_m2, float(prices[-1, idx_1[k]]), float(prices[-1, idx_2[k]])))
+        else:
+            to_keep.append(position)
 
-        # Fetch order info for market 1
-        try:
-            order_m1 = await get_order(client, position["order_id_m1"])
-            if order_m1 is None:
-                print(f"Order {position['order_id_m1']} for {position_market_m1} not found. Skipping...")
-                save_output.append(position)  # Save it for later processing
-                continue
-            order_market_m1 = order_m1.get("ticker")
-            order_size_m1 = order_m1.get("size")
-            order_side_m1 = order_m1.get("side")
-        except Exception as e:
-            print(f"Error fetching order for market 1 ({position['order_id_m1']}): {e}")
-            save_output.append(position)  # Save it for later processing
-            continue
+    print(f"Evaluated {len(priced)} positions in {time.perf_counter() - start_time:.3f}s, {len(to_close)} to close")
+    return to_close, to_keep
 
-        # Protect API
-        time.sleep(0.5)
-
-        # Fetch order info for market 2
-        try:
-            order_m2 = await get_order(client, position["order_id_m2"])
-            if order_m2 is None:
-                print(f"Order {position['order_id_m2']} for {position_market_m2} not found. Skipping...")
-                save_output.append(position)  # Save it for later processing
-                continue
-            order_market_m2 = order_m2.get("ticker")
-            order_size_m2 = order_m2.get("size")
-            order_side_m2 = order_m2.get("side")
-        except Exception as e:
-            print(f"Error fetching order for market 2 ({position['order_id_m2']}): {e}")
-            save_output.append(position)  # Save it for later processing
-            continue
+# Close position
+async def close_position(client, position, order_m1, order_m2, price_m1, price_m2):
+    """
+    Closes both legs of a pair position concurrently with reduce-only orders.
+    Returns (market 1 closed, market 2 closed).
+    """
+    market_m1 = position["market_1"]
+    market_m2 = position["market_2"]
+
+    # Close on the opposite side at an accepting price, using the sizes sent to the exchange
+    side_m1 = "SELL" if position["order_m1_side"] == "BUY" else "BUY"
+    side_m2 = "SELL" if position["order_m2_side"] == "BUY" else "BUY"
+    accept_price_m1 = market_registry.format_price(market_m1, price_m1 * (1.05 if side_m1 == "BUY" else 0.95))
+    accept_price_m2 = market_registry.format_price(market_m2, price_m2 * (1.05 if side_m2 == "BUY" else 0.95))
+
+    print(f"Closing positions for {market_m1} and {market_m2}")
+    close_m1, close_m2 = await asyncio.gather(
+        place_market_order(client, market=market_m1, side=side_m1, size=order_m1.get("size"), price=accept_price_m1, reduce_only=True),
+        place_market_order(client, market=market_m2, side=side_m2, size=order_m2.get("size"), price=accept_price_m2, reduce_only=True),
+    )
+
+    for market, result in ((market_m1, close_m1), (market_m2, close_m2)):
+        if result["status"] == "success":
+            print(f"Closed order for {market}: {result['order_id']}")
+        else:
+            print(f"Error closing position for {market}: {result['error']}")
+    return close_m1["status"] == "success", close_m2["status"] == "success"
 
-        # Ensure sizes match what was sent to the exchange
-        position_size_m1 = order_m1.get("size")
-        position_size_m2 = order_m2.get("size")
+# Manage trade exits
+async def manage_trade_exits(client):
+    """
+    Manage exiting open positions based upon criteria set in constants.
+    Handles both pair-based and single-market positions.
+    """
 
-        # Check if positions match exchange and live data
-        check_m1 = position_market_m1 == order_market_m1 and position_size_m1 == order_size_m1 and position_side_m1 == order_side_m1
-        check_m2 = position_market_m2 == order_market_m2 and position_size_m2 == order_size_m2 and position_side_m2 == order_side_m2
-        check_live = position_market_m1 in markets_live and position_market_m2 in markets_live
+    # Load live pair agents
+    state_store = get_state_store()
+    open_positions_dict = state_store.get_agents("LIVE")
 
-        # Guard: If not all match, skip the exit
-        if not check_m1 or not check_m2 or not check_live:
-            print(f"Warning: Open positions for {position_market_m1} and {position_market_m2} do not match exchange records. Skipping...")
-            save_output.append(position)
-            continue
+    # Guard: Exit if no open positions saved
+    if len(open_positions_dict) < 1:
+        print("No open positions saved")
+        return "complete"
 
-        # Get price data
-        series_1 = await get_candles_recent(client, position_market_m1)
-        time.sleep(0.2)
-        series_2 = await get_candles_recent(client, position_market_m2)
-        time.sleep(0.2)
-
-        # Get markets data for reference of tick size
-        markets = await get_markets(client)
-
-        # Protect API rate limit
-        time.sleep(0.2)
-
-        # Trigger close based on Z-Score if specified in constants
-        if CLOSE_AT_ZSCORE_CROSS:
-            hedge_ratio = position["hedge_ratio"]
-            z_score_traded = position["z_score"]
-            if len(series_1) > 0 and len(series_1) == len(series_2):
-                spread = np.array(series_1) - (hedge_ratio * np.array(series_2))
-                z_score_current = calculate_zscore(spread).values.tolist()[-1]
-
-            # Determine if Z-score conditions trigger an exit
-            z_score_level_check = abs(z_score_current) >= abs(z_score_traded)
-            z_score_cross_check = (z_score_current < 0 and z_score_traded > 0) or (z_score_current > 0 and z_score_traded < 0)
-
-            if z_score_level_check and z_score_cross_check:
-                is_close = True
-
-        # Close positions if triggered
-        if is_close:
-            # Determine side for market 1
-            side_m1 = "SELL" if position_side_m1 == "BUY" else "BUY"
-
-            # Determine side for market 2
-            side_m2 = "SELL" if position_side_m2 == "BUY" else "BUY"
-
-            # Get and format Price
-            price_m1 = float(series_1[-1])
-            price_m2 = float(series_2[-1])
-            tick_size_m1 = markets["markets"][position_market_m1]["tickSize"]
-            tick_size_m2 = markets["markets"][position_market_m2]["tickSize"]
-            accept_price_m1 = format_number(price_m1 * (1.05 if side_m1 == "BUY" else 0.95), tick_size_m1)
-            accept_price_m2 = format_number(price_m2 * (1.05 if side_m2 == "BUY" else 0.95), tick_size_m2)
-
-            # Close positions
-            try:
-                # Close position for market 1
-                print(f"Closing position for {position_market_m1}")
-                close_order_m1, order_id = await place_market_order(client, market=position_market_m1, side=side_m1, size=position_size_m1, price=accept_price_m1, reduce_only=True)
-                print(f"Closed order for market 1: {close_order_m1['id']}")
-
-                # Protect API
-                time.sleep(1)
-
-                # Close position for market 2
-                print(f"Closing position for {position_market_m2}")
-                close_order_m2, order_id = await place_market_order(client, market=position_market_m2, side=side_m2, size=position_size_m2, price=accept_price_m2, reduce_only=True)
-                print(f"Closed order for market 2: {close_order_m2['id']}")
-
-            except Exception as e:
-                print(f"Error closing positions for {position_market_m1} and {position_market_m2}: {e}")
+    # Reconcile saved positions against the exchange in one pass
+    save_output, positions_ready = await reconcile_positions(client, open_positions_dict)
+
+    # Evaluate every confirmed position at once
+    if CLOSE_AT_ZSCORE_CROSS and len(positions_ready) > 0:
+        await market_registry.ensure_fresh(client)
+        to_close, to_keep = await evaluate_exits(client, positions_ready)
+        save_output.extend(to_keep)
+
+        # Submit the triggered closes concurrently
+        results = await asyncio.gather(*(close_position(client, *close) for close in to_close))
+        for (position, *_), (closed_m1, closed_m2) in zip(to_close, results):
+            if closed_m1 and closed_m2:
+                state_store.set_agent_status(position["id"], "CLOSED")
+            elif closed_m1 or closed_m2:
+                # One leg is flat, so the pair can no longer be reconciled or closed as a pair
+                open_market = position["market_2"] if closed_m1 else position["market_1"]
+                state_store.set_agent_status(position["id"], "PARTIAL")
+                print(f"Warning: {position['market_1']}/{position['market_2']} partially closed, {open_market} is still open")
+                send_message(f"Partial close of {position['market_1']}/{position['market_2']}: {open_market} is still open, close it manually")
+            else:
                 save_output.append(position)
-        else:
-            save_output.append(position)
+    else:
+        save_output.extend(position for position, _, _ in positions_ready)
 
-    # Save remaining positions
-    print(f"{len(save_output)} positions remaining. Saving file...")
-    with open("bot_agents.json", "w") as f:
-        json.dump(save_output, f)
+    print(f"{len(save_output)} positions remaining.")
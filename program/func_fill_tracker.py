@@ -0,0 +1,95 @@
+from constants import FILL_POLL_MIN, FILL_POLL_MAX, FILL_TIMEOUT
+from func_private import get_orders_by_id, cancel_order
+from func_state_store import get_state_store
+import asyncio
+
+FINAL_STATUSES = ("FILLED", "CANCELED")
+
+# Fill Tracker Class
+class FillTracker:
+    """
+    Waits for orders to fill. Every pending order is checked in one bulk lookup per poll, so
+    any number of agents can wait on fills without polling on their own. Polling starts fast
+    when an order is added and backs off while nothing changes. An order still open after its
+    timeout is canceled.
+    """
+
+    def __init__(self, poll_min=FILL_POLL_MIN, poll_max=FILL_POLL_MAX, timeout=FILL_TIMEOUT):
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.timeout = timeout
+        self.pending = {}
+        self.task = None
+        self.loop = None
+        self.wake = None
+        self.delay = poll_min
+
+    async def track(self, client, order_id, timeout=None):
+        """
+        Returns FILLED or CANCELED once the order reaches either, or the last status seen
+        (UNKNOWN if none) after it times out and a cancel has been sent.
+        """
+        if not order_id:
+            return "UNKNOWN"
+
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.pending = {}
+            self.task = None
+            self.wake = asyncio.Event()
+
+        entry = self.pending.get(order_id)
+        if entry is None:
+            entry = {"future": loop.create_future(), "deadline": loop.time() + (timeout or self.timeout), "status": "UNKNOWN"}
+            self.pending[order_id] = entry
+            self.wake.set()
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self.run(client))
+        return await asyncio.shield(entry["future"])
+
+    async def run(self, client):
+        while len(self.pending) > 0:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.delay)
+            except asyncio.TimeoutError:
+                pass
+            if self.wake.is_set():
+                self.wake.clear()
+                self.delay = self.poll_min
+
+            try:
+                await self.poll(client)
+            except Exception as e:
+                print(f"Error polling order fills: {e}")
+            self.delay = min(self.delay * 2, self.poll_max)
+
+    async def poll(self, client):
+        orders = await get_orders_by_id(client, list(self.pending))
+        now = self.loop.time()
+
+        expired = []
+        for order_id, entry in list(self.pending.items()):
+            entry["status"] = orders.get(order_id, {}).get("status", entry["status"])
+            if entry["status"] in FINAL_STATUSES:
+                self.resolve(order_id)
+            elif now >= entry["deadline"]:
+                expired.append(order_id)
+
+        # Cancel whatever did not fill in time
+        if len(expired) > 0:
+            for order_id in expired:
+                print(f"Order {order_id} not filled. Cancelling order.")
+            await asyncio.gather(*(cancel_order(client, order_id) for order_id in expired))
+            for order_id in expired:
+                self.resolve(order_id)
+
+    def resolve(self, order_id):
+        entry = self.pending.pop(order_id)
+        if entry["status"] != "UNKNOWN":
+            get_state_store().set_order_status(order_id, entry["status"])
+        if not entry["future"].done():
+            entry["future"].set_result(entry["status"])
+
+# Shared tracker
+fill_tracker = FillTracker()
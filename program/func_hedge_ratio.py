@@ -0,0 +1,164 @@
+from constants import RESOLUTION, HEDGE_RATIO_FORGETTING, HEDGE_RATIO_STATE_PATH
+from func_utils import RESOLUTION_SECONDS, parse_iso
+import numpy as np
+import json
+import time
+import os
+
+# Hedge Ratio Tracker Class
+class HedgeRatioTracker:
+    """
+    Recursive least squares estimate of base = intercept + hedge_ratio * quote for one pair.
+    This is the Kalman filter for a random-walk coefficient with forgetting factor `forgetting`,
+    so each closed candle costs O(1). An exponentially weighted mean and variance of the
+    spread are tracked alongside.
+    """
+
+    def __init__(self, theta, P, forgetting=HEDGE_RATIO_FORGETTING, spread_mean=0.0, spread_var=0.0, last_closed=None, n_updates=0):
+        self.theta = np.asarray(theta, dtype=np.float64)
+        self.P = np.asarray(P, dtype=np.float64)
+        self.forgetting = forgetting
+        self.spread_mean = spread_mean
+        self.spread_var = spread_var
+        self.last_closed = last_closed
+        self.n_updates = n_updates
+
+    @classmethod
+    def from_history(cls, series_1, series_2, forgetting=HEDGE_RATIO_FORGETTING, hedge_ratio=None):
+        """
+        Starts a tracker from a weighted least squares fit over historical closes.
+        Given hedge_ratio, such as the one from the cointegration scan, it is kept as the
+        starting slope and only the intercept is fitted.
+        """
+        n = len(series_1)
+        weights = forgetting ** np.arange(n - 1, -1, -1)
+        X = np.column_stack((np.ones(n), series_2))
+        information = (X * weights[:, np.newaxis]).T @ X
+        P = np.linalg.inv(information)
+        if hedge_ratio is None:
+            theta = P @ ((X * weights[:, np.newaxis]).T @ series_1)
+        else:
+            intercept = np.average(series_1 - hedge_ratio * series_2, weights=weights)
+            theta = np.array([intercept, hedge_ratio], dtype=np.float64)
+        spread = series_1 - X @ theta
+        tracker = cls(theta, P, forgetting, float(spread.mean()), float(spread.var()), n_updates=n)
+        return tracker
+
+    @property
+    def intercept(self):
+        return float(self.theta[0])
+
+    @property
+    def hedge_ratio(self):
+        return float(self.theta[1])
+
+    def update(self, price_1, price_2):
+        """
+        Adds one closed candle for the pair. O(1) in time and memory.
+        """
+        phi = np.array([1.0, price_2])
+        P_phi = self.P @ phi
+        gain = P_phi / (self.forgetting + phi @ P_phi)
+        error = price_1 - phi @ self.theta
+        self.theta = self.theta + gain * error
+        self.P = (self.P - np.outer(gain, P_phi)) / self.forgetting
+
+        # Spread statistics with the same forgetting
+        spread = price_1 - phi @ self.theta
+        alpha = 1 - self.forgetting
+        delta = spread - self.spread_mean
+        self.spread_mean += alpha * delta
+        self.spread_var = (1 - alpha) * (self.spread_var + alpha * delta ** 2)
+        self.n_updates += 1
+
+    def to_dict(self):
+        return {
+            "theta": self.theta.tolist(),
+            "P": self.P.tolist(),
+            "forgetting": self.forgetting,
+            "spread_mean": self.spread_mean,
+            "spread_var": self.spread_var,
+            "last_closed": self.last_closed,
+            "n_updates": self.n_updates,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+# Hedge Ratio Book Class
+class HedgeRatioBook:
+    """
+    Trackers for every pair, persisted to HEDGE_RATIO_STATE_PATH between runs.
+    """
+
+    def __init__(self, path=HEDGE_RATIO_STATE_PATH):
+        self.path = path
+        self.trackers = None
+        self.changed = False
+
+    def load(self):
+        self.trackers = {}
+        try:
+            with open(self.path, "r") as f:
+                for key, data in json.load(f).items():
+                    self.trackers[key] = HedgeRatioTracker.from_dict(data)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({key: tracker.to_dict() for key, tracker in self.trackers.items()}, f)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+    def update(self, base_market, quote_market, series_1, series_2, fallback_hedge_ratio, last_started):
+        """
+        Feeds any newly closed candles into the pair's tracker and returns its hedge ratio.
+        series_1 and series_2 are recent closes whose last candle started at `last_started`
+        (an indexer startedAt); that candle is left out while it is still in progress.
+        New trackers start from fallback_hedge_ratio, the scan's hedge ratio, which is also
+        returned if the series cannot be used.
+        """
+        if self.trackers is None:
+            self.load()
+        if len(series_1) < 3 or len(series_1) != len(series_2) or last_started is None:
+            return fallback_hedge_ratio
+
+        # Use the candle start times, the indexer may not have published the newest candle yet
+        step = RESOLUTION_SECONDS[RESOLUTION]
+        last_start = int(parse_iso(last_started).timestamp())
+        if last_start > int(time.time()) // step * step - step:
+            closed_1 = np.asarray(series_1[:-1], dtype=np.float64)
+            closed_2 = np.asarray(series_2[:-1], dtype=np.float64)
+            last_closed = last_start - step
+        else:
+            closed_1 = np.asarray(series_1, dtype=np.float64)
+            closed_2 = np.asarray(series_2, dtype=np.float64)
+            last_closed = last_start
+
+        key = f"{base_market}/{quote_market}"
+        tracker = self.trackers.get(key)
+        if tracker is not None and tracker.last_closed is not None and last_closed < tracker.last_closed:
+            return tracker.hedge_ratio
+        if tracker is None or tracker.last_closed is None or (last_closed - tracker.last_closed) // step >= len(closed_1):
+            # New pair or too far behind to catch up candle by candle
+            try:
+                tracker = HedgeRatioTracker.from_history(closed_1, closed_2, hedge_ratio=fallback_hedge_ratio)
+            except np.linalg.LinAlgError:
+                return fallback_hedge_ratio
+        else:
+            for k in range(int((last_closed - tracker.last_closed) // step), 0, -1):
+                tracker.update(closed_1[-k], closed_2[-k])
+
+        if tracker.last_closed != last_closed:
+            tracker.last_closed = last_closed
+            self.trackers[key] = tracker
+            self.changed = True
+        return tracker.hedge_ratio
+
+# Shared book
+hedge_book = HedgeRatioBook()
@@ -0,0 +1,77 @@
+from dydx_v4_client.node.market import Market
+from constants import MARKET_REGISTRY_TTL
+from func_rate_limit import indexer_limiter
+from func_utils import get_quantizer
+import asyncio
+import time
+
+# Market Registry Class
+class MarketRegistry:
+    """
+    Cached perpetual market metadata, refreshed at most once every `ttl` seconds.
+    Keeps prebuilt Market objects and tick/step size quantizers for each ticker so
+    order paths do not download the full markets payload to read one market.
+    """
+
+    def __init__(self, ttl=MARKET_REGISTRY_TTL):
+        self.ttl = ttl
+        self.markets = {}
+        self.market_objects = {}
+        self.price_quantizers = {}
+        self.size_quantizers = {}
+        self.updated = None
+        self.refreshing = None
+
+    def is_stale(self):
+        return self.updated is None or time.monotonic() - self.updated > self.ttl
+
+    async def refresh(self, client):
+        """
+        Downloads market metadata and rebuilds Market objects and quantizers.
+        """
+        await indexer_limiter.acquire()
+        response = await client.indexer.markets.get_perpetual_markets()
+        markets = response["markets"]
+
+        self.market_objects = {ticker: Market(market) for ticker, market in markets.items()}
+        self.price_quantizers = {ticker: get_quantizer(market["tickSize"]) for ticker, market in markets.items()}
+        self.size_quantizers = {ticker: get_quantizer(market["stepSize"]) for ticker, market in markets.items()}
+        self.markets = markets
+        self.updated = time.monotonic()
+
+    async def ensure_fresh(self, client):
+        # Concurrent callers share one refresh
+        if not self.is_stale():
+            return
+        if self.refreshing is None:
+            self.refreshing = asyncio.ensure_future(self.refresh(client))
+        try:
+            await asyncio.shield(self.refreshing)
+        finally:
+            if self.refreshing is not None and self.refreshing.done():
+                self.refreshing = None
+
+    async def get_markets(self, client):
+        """
+        Returns the raw market data dict keyed by ticker, as in get_perpetual_markets()["markets"].
+        """
+        await self.ensure_fresh(client)
+        return self.markets
+
+    async def get_market(self, client, ticker):
+        """
+        Returns the prebuilt Market for ticker. Raises KeyError if the market does not exist.
+        """
+        await self.ensure_fresh(client)
+        if ticker not in self.market_objects:
+            raise KeyError(f"Market {ticker} not found.")
+        return self.market_objects[ticker]
+
+    def format_price(self, ticker, price):
+        return self.price_quantizers[ticker].format(price)
+
+    def format_size(self, ticker, size):
+        return self.size_quantizers[ticker].format(size)
+
+# Shared registry
+market_registry = MarketRegistry()
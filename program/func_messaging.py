@@ -1,13 +1,159 @@
-import requests
-from decouple import config
+from constants import (
+  TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_API_URL, TELEGRAM_QUEUE_SIZE,
+  TELEGRAM_MIN_INTERVAL, TELEGRAM_DIGEST_WINDOW
+)
+import asyncio
+import time
+
+TELEGRAM_MAX_LENGTH = 4096
+
+# Telegram Notifier Class
+class TelegramNotifier:
+  """
+  Sends Telegram messages from a background task so callers never wait on the network.
+  Messages go into a bounded queue; a burst arriving within `digest_window` seconds is
+  merged into one digest per chat, each chat is sent at most once per `min_interval`
+  seconds, and all requests share one pooled HTTP session. Point `base_url` at a local
+  stub server (see fake_telegram.py) to run it offline.
+  """
+
+  def __init__(self, token=TELEGRAM_TOKEN, chat_id=TELEGRAM_CHAT_ID, base_url=TELEGRAM_API_URL,
+               queue_size=TELEGRAM_QUEUE_SIZE, min_interval=TELEGRAM_MIN_INTERVAL, digest_window=TELEGRAM_DIGEST_WINDOW):
+    self.url = f"{base_url}/bot{token}/sendMessage"
+    self.chat_id = chat_id
+    self.queue_size = queue_size
+    self.min_interval = min_interval
+    self.digest_window = digest_window
+    self.last_sent = {}
+    self.dropped = 0
+    self.queue = None
+    self.session = None
+    self.task = None
+    self.loop = None
+
+  def send(self, message, chat_id=None):
+    """
+    Queues a message and returns straight away. Returns "queued", or "dropped" if the queue is full.
+    Outside an event loop the message is sent synchronously.
+    """
+    chat_id = chat_id or self.chat_id
+    try:
+      loop = asyncio.get_running_loop()
+    except RuntimeError:
+      return self.send_now(message, chat_id)
+
+    if self.loop is not loop:
+      self.loop = loop
+      self.queue = asyncio.Queue(self.queue_size)
+      self.session = None
+      self.task = None
+    if self.task is None or self.task.done():
+      self.task = loop.create_task(self.run())
+
+    try:
+      self.queue.put_nowait((chat_id, str(message)))
+      return "queued"
+    except asyncio.QueueFull:
+      self.dropped += 1
+      return "dropped"
+
+  def send_now(self, message, chat_id):
+    import requests
+    try:
+      res = requests.post(self.url, json={"chat_id": chat_id, "text": str(message)[:TELEGRAM_MAX_LENGTH]}, timeout=10)
+      return "sent" if res.status_code == 200 else "failed"
+    except requests.RequestException:
+      return "failed"
+
+  async def run(self):
+    while True:
+      first = await self.queue.get()
+
+      # Let the burst arrive, then take everything queued
+      await asyncio.sleep(self.digest_window)
+      batch = [first]
+      while not self.queue.empty():
+        batch.append(self.queue.get_nowait())
+
+      by_chat = {}
+      for chat_id, message in batch:
+        by_chat.setdefault(chat_id, []).append(message)
+      if self.dropped > 0:
+        by_chat.setdefault(self.chat_id, []).append(f"({self.dropped} messages dropped, notification queue full)")
+        self.dropped = 0
+
+      try:
+        for chat_id, messages in by_chat.items():
+          for text in self.digest(messages):
+            await self.post(chat_id, text)
+      except Exception as e:
+        print(f"Error sending Telegram message: {e}")
+      finally:
+        for _ in batch:
+          self.queue.task_done()
+
+  def digest(self, messages):
+    # One message as is, several as a numbered digest, split to Telegram's length limit
+    if len(messages) == 1:
+      text = messages[0]
+    else:
+      text = f"{len(messages)} messages:\n" + "\n".join(f"{i}. {message}" for i, message in enumerate(messages, 1))
+    return [text[i:i + TELEGRAM_MAX_LENGTH] for i in range(0, len(text), TELEGRAM_MAX_LENGTH)]
+
+  async def post(self, chat_id, text):
+    # Imported on first send to keep it off the startup path
+    import aiohttp
+    if self.session is None or self.session.closed:
+      self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=4), timeout=aiohttp.ClientTimeout(total=10))
+
+    for _ in range(3):
+      # Per-chat rate limit
+      wait = self.last_sent.get(chat_id, 0) + self.min_interval - time.monotonic()
+      if wait > 0:
+        await asyncio.sleep(wait)
+      self.last_sent[chat_id] = time.monotonic()
+
+      async with self.session.post(self.url, json={"chat_id": chat_id, "text": text}) as res:
+        if res.status == 200:
+          return "sent"
+        if res.status != 429:
+          print(f"Telegram message failed with status {res.status}")
+          return "failed"
+        body = await res.json(content_type=None)
+        await asyncio.sleep(body.get("parameters", {}).get("retry_after", self.min_interval))
+    return "failed"
+
+  async def flush(self, timeout=30):
+    """
+    Waits until everything queued has been sent, for up to `timeout` seconds.
+    """
+    if self.queue is None or self.loop is not asyncio.get_running_loop():
+      return
+    try:
+      await asyncio.wait_for(self.queue.join(), timeout)
+    except asyncio.TimeoutError:
+      print("Timed out sending queued Telegram messages")
+
+  async def close(self):
+    await self.flush()
+    if self.task is not None:
+      self.task.cancel()
+      try:
+        await self.task
+      except asyncio.CancelledError:
+        pass
+      self.task = None
+    if self.session is not None:
+      await self.session.close()
+      self.session = None
+
+# Shared notifier
+notifier = TelegramNotifier()
 
 # Send Message
 def send_message(message):
-  bot_token = config("TELEGRAM_TOKEN")
-  chat_id = config("TELEGRAM_CHAT_ID")
-  url = f"https://api.telegram.org/bot{bot_token}/sendMessage?chat_id={chat_id}&text={message}"
-  res = requests.get(url)
-  if res.status_code == 200:
-    return "sent"
-  else:
-    return "failed"
+  return notifier.send(message)
+
+# Send queued messages before shutting down
+async def close_messaging():
+  await notifier.close()
@@ -0,0 +1,108 @@
+from constants import (
+    DYDX_ADDRESS, ORDER_PAGE_SIZE, ORDER_CONFIRM_POLL_MIN, ORDER_CONFIRM_POLL_MAX,
+    ORDER_CONFIRM_GRACE_BLOCKS, ORDER_CONFIRM_TIMEOUT
+)
+from func_rate_limit import indexer_limiter
+from func_block_height import block_tracker
+import asyncio
+
+# Order Confirmer Class
+class OrderConfirmer:
+    """
+    Waits for submitted orders to show up on the indexer, keyed by (client_id, clob_pair_id).
+    All pending orders share one poll of the latest subaccount orders, so confirming many
+    orders costs the same as confirming one. Polling starts fast and backs off while nothing
+    new is pending. An order fails once the chain is past its good_til_block (plus a grace)
+    or after `timeout` seconds.
+    """
+
+    def __init__(self, poll_min=ORDER_CONFIRM_POLL_MIN, poll_max=ORDER_CONFIRM_POLL_MAX,
+                 grace_blocks=ORDER_CONFIRM_GRACE_BLOCKS, timeout=ORDER_CONFIRM_TIMEOUT):
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.grace_blocks = grace_blocks
+        self.timeout = timeout
+        self.pending = {}
+        self.task = None
+        self.loop = None
+        self.wake = None
+        self.delay = poll_min
+
+    async def confirm(self, client, market_order_id, good_til_block):
+        """
+        Returns the indexer order id once the order is seen. Raises ValueError if it expires unseen.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.pending = {}
+            self.task = None
+            self.wake = asyncio.Event()
+
+        key = (market_order_id.client_id, market_order_id.clob_pair_id)
+        future = loop.create_future()
+        self.pending[key] = {"future": future, "good_til_block": good_til_block, "started": loop.time()}
+        self.wake.set()
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self.run(client))
+
+        try:
+            return await future
+        finally:
+            if key in self.pending and self.pending[key]["future"] is future:
+                del self.pending[key]
+
+    async def run(self, client):
+        while len(self.pending) > 0:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.delay)
+            except asyncio.TimeoutError:
+                pass
+
+            # New orders restart the backoff after giving the indexer a moment
+            if self.wake.is_set():
+                self.wake.clear()
+                self.delay = self.poll_min
+                await asyncio.sleep(self.poll_min)
+
+            await self.poll(client)
+            self.delay = min(self.delay * 2, self.poll_max)
+
+    async def poll(self, client):
+        await indexer_limiter.acquire()
+        try:
+            orders = await client.indexer_account.account.get_subaccount_orders(
+                DYDX_ADDRESS,
+                0,
+                limit=ORDER_PAGE_SIZE,
+                return_latest_orders="true",
+            )
+        except Exception as e:
+            print(f"Error polling recent orders: {e}")
+            orders = []
+
+        # Resolve every pending order that has appeared
+        for order in orders:
+            entry = self.pending.pop((int(order["clientId"]), int(order["clobPairId"])), None)
+            if entry is not None and not entry["future"].done():
+                entry["future"].set_result(order["id"])
+
+        # Only ask for the block height once an order has been waiting a while
+        now = self.loop.time()
+        if not any(now - entry["started"] >= self.poll_max for entry in self.pending.values()):
+            return
+        try:
+            height = await block_tracker.get(client)
+        except Exception as e:
+            print(f"Error fetching block height: {e}")
+            height = None
+
+        for key, entry in list(self.pending.items()):
+            expired = height is not None and height > entry["good_til_block"] + self.grace_blocks
+            if expired or now - entry["started"] >= self.timeout:
+                del self.pending[key]
+                if not entry["future"].done():
+                    entry["future"].set_exception(ValueError("Order placement failed: Unable to detect order in recent orders"))
+
+# Shared confirmer
+order_confirmer = OrderConfirmer()
@@ -1,10 +1,13 @@
 from dydx_v4_client import MAX_CLIENT_ID, Order, OrderFlags
-from dydx_v4_client.node.market import Market
-from constants import DYDX_ADDRESS
-from func_utils import format_number
+from constants import DYDX_ADDRESS, ORDER_PAGE_SIZE, ORDER_PAGES_MAX
+from func_markets import market_registry
+from func_rate_limit import indexer_limiter, node_limiter
+from func_block_height import block_tracker
+from func_order_confirm import order_confirmer
+from func_state_store import get_state_store
+import asyncio
 import random
 import time
-import json
 
 # Cancel Order
 async def cancel_order(client, order_id):
@@ -13,15 +16,16 @@ async def cancel_order(client, order_id):
         if order is None:
             raise ValueError(f"Order {order_id} not found.")
         
-        market = Market((await client.indexer.markets.get_perpetual_markets())["markets"][order["ticker"]])
+        market = await market_registry.get_market(client, order["ticker"])
         market_order_id = market.order_id(
             DYDX_ADDRESS,
             0,
             random.randint(0, MAX_CLIENT_ID),
             OrderFlags.SHORT_TERM
         )
-        current_block = await client.node.latest_block_height()
+        current_block = await block_tracker.get(client)
         good_til_block = current_block + 1 + 10
+        await node_limiter.acquire()
         await client.node.cancel_order(
             client.wallet,
             market_order_id,
@@ -39,6 +43,55 @@ async def get_order(client, order_id):
         print(f"Error fetching order {order_id}: {e}")
         return None
 
+# Get Orders By Id
+async def get_orders_by_id(client, order_ids, page_size=ORDER_PAGE_SIZE, max_pages=ORDER_PAGES_MAX):
+    """
+    Looks up many orders at once. Pages through the subaccount's orders, newest good-til-block
+    first, until every id is found, then fetches any stragglers individually.
+    Returns a dict of order id to order. Ids that cannot be fetched are left out.
+    """
+    wanted = set(order_id for order_id in order_ids if order_id)
+    orders = {}
+    before_or_at = None
+
+    for _ in range(max_pages):
+        if wanted.issubset(orders):
+            break
+        await indexer_limiter.acquire()
+        try:
+            page = await client.indexer_account.account.get_subaccount_orders(
+                DYDX_ADDRESS,
+                0,
+                limit=page_size,
+                good_til_block_before_or_at=before_or_at,
+            )
+        except Exception as e:
+            print(f"Error fetching subaccount orders: {e}")
+            break
+
+        new_orders = [order for order in page if order["id"] not in orders]
+        for order in new_orders:
+            orders[order["id"]] = order
+
+        # Next page starts at the oldest block seen, stepping past it if nothing new came back
+        blocks = [int(order["goodTilBlock"]) for order in page if order.get("goodTilBlock")]
+        if len(page) < page_size or len(blocks) == 0:
+            break
+        before_or_at = min(blocks) if len(new_orders) > 0 else min(blocks) - 1
+
+    # Fall back to single lookups for orders older than the pages fetched
+    missing = [order_id for order_id in wanted if order_id not in orders]
+    if len(missing) > 0:
+        async def fetch(order_id):
+            await indexer_limiter.acquire()
+            return await get_order(client, order_id)
+
+        for order_id, order in zip(missing, await asyncio.gather(*(fetch(order_id) for order_id in missing))):
+            if order is not None:
+                orders[order_id] = order
+
+    return {order_id: orders[order_id] for order_id in wanted if order_id in orders}
+
 # Get Account
 async def get_account(client):
     try:
@@ -68,85 +121,137 @@ async def get_open_positions(client):
         print(f"Error fetching open positions: {e}")
         return {}
 
-# Place Market Order (with added delay)
-async def place_market_order(client, market, side, size, price, reduce_only):
-    try:
-        size = float(size)
-        price = float(price)
+# Build Market Order
+async def build_market_order(client, market, side, size, price, reduce_only, current_block=None):
+    """
+    Builds a short-term market order without submitting it.
+    Returns (market_order_id, order). Pass current_block to share one block height across legs.
+    """
+    size = float(size)
+    price = float(price)
 
-        ticker = market
-        current_block = await client.node.latest_block_height()
-        market_data = (await client.indexer.markets.get_perpetual_markets())["markets"][ticker]
-        market = Market(market_data)
-        market_order_id = market.order_id(DYDX_ADDRESS, 0, random.randint(0, MAX_CLIENT_ID), OrderFlags.SHORT_TERM)
-        good_til_block = current_block + 1 + 10
+    if current_block is None:
+        current_block = await block_tracker.get(client)
+    market_obj = await market_registry.get_market(client, market)
+    market_order_id = market_obj.order_id(DYDX_ADDRESS, 0, random.randint(0, MAX_CLIENT_ID), OrderFlags.SHORT_TERM)
+    good_til_block = current_block + 1 + 10
 
-        # Place Market Order
-        order = await client.node.place_order(
-            client.wallet,
-            market.order(
-                market_order_id,
-                side=Order.Side.SIDE_BUY if side == "BUY" else Order.Side.SIDE_SELL,
-                size=size,
-                price=price,
-                time_in_force=Order.TIME_IN_FORCE_UNSPECIFIED,
-                reduce_only=reduce_only,
-                good_til_block=good_til_block
-            ),
-        )
+    order = market_obj.order(
+        market_order_id,
+        side=Order.Side.SIDE_BUY if side == "BUY" else Order.Side.SIDE_SELL,
+        size=size,
+        price=price,
+        time_in_force=Order.TIME_IN_FORCE_UNSPECIFIED,
+        reduce_only=reduce_only,
+        good_til_block=good_til_block
+    )
+    return market_order_id, order
 
-        # Add a delay before fetching recent orders to allow time for the order to be fully registered
-        time.sleep(5)  # Introduce a 5-second delay here
+# Confirm Order Placement
+async def confirm_order_placement(client, market_order_id, good_til_block):
+    """
+    Waits until a submitted order shows up on the indexer and returns its order id.
+    Raises ValueError if it is not seen before good_til_block passes.
+    """
+    return await order_confirmer.confirm(client, market_order_id, good_til_block)
 
-        # Confirm recent order placement
-        orders = await client.indexer_account.account.get_subaccount_orders(
-            DYDX_ADDRESS,
-            0,
-            ticker,
-            return_latest_orders="true",
-        )
+# Record Order
+def record_order(ticker, order_id, side, size, price):
+    get_state_store().record_order(order_id, ticker, side, size, price)
 
-        # Find matching order ID
-        order_id = next(
-            (o["id"] for o in orders if int(o["clientId"]) == market_order_id.client_id and int(o["clobPairId"]) == market_order_id.clob_pair_id),
-            ""
-        )
+# Place Market Order
+async def place_market_order(client, market, side, size, price, reduce_only):
+    """
+    Submits a market order and confirms it reached the indexer.
+    """
+    try:
+        ticker = market
+        market_order_id, order = await build_market_order(client, ticker, side, size, price, reduce_only)
 
-        if order_id == "":
-            raise ValueError("Order placement failed: Unable to detect order in recent orders")
+        # Place Market Order
+        await node_limiter.acquire()
+        await client.node.place_order(client.wallet, order)
 
+        # Confirm order reached the indexer
+        order_id = await confirm_order_placement(client, market_order_id, order.good_til_block)
         print(f"Order placed successfully: {order_id}")
-        
-        # Update the bot_agents.json file after successful order placement
-        with open("bot_agents.json", "r+") as f:
-            try:
-                # Load existing data
-                data = json.load(f)
-            except json.JSONDecodeError:
-                # If file is empty or corrupt, start with an empty list
-                data = []
-            
-            # Add new order data
-            data.append({
-                "market": ticker,  # Use the ticker string for serialization
-                "order_id": order_id,
-                "side": side,
-                "size": size,
-                "price": price,
-                "timestamp": time.time()
-            })
-
-            # Rewrite updated data to the file
-            f.seek(0)
-            json.dump(data, f, indent=4)
-            f.truncate()  # Ensure the file is truncated if new data is shorter
 
+        record_order(ticker, order_id, side, size, price)
         return {"status": "success", "order_id": order_id}
 
     except Exception as e:
         print(f"Error placing order: {e}")
         return {"status": "failed", "error": str(e)}
 
+# Place Pair Orders
+async def place_pair_orders(client, leg_1, leg_2):
+    """
+    Builds both legs up front, submits them concurrently and confirms them in parallel.
+    Each leg is a dict with market, side, size, price and optionally reduce_only and
+    failsafe_price (the price used to close that leg if the other leg fails).
+    If exactly one leg fails, the other is closed with a reduce-only order once it fills,
+    or canceled if it does not fill in time.
+    Returns {"status": "success", "order_ids": [id_1, id_2]} or {"status": "failed", "error": ...}.
+    """
+    legs = (leg_1, leg_2)
+
+    # Build both legs against one block height
+    try:
+        current_block = await block_tracker.get(client)
+        prepared = await asyncio.gather(*(
+            build_market_order(client, leg["market"], leg["side"], leg["size"], leg["price"], leg.get("reduce_only", False), current_block)
+            for leg in legs
+        ))
+    except Exception as e:
+        print(f"Error building pair orders: {e}")
+        return {"status": "failed", "error": str(e)}
+
+    # Submit and confirm both legs concurrently
+    submit_times = [None, None]
+
+    async def submit(index):
+        leg = legs[index]
+        market_order_id, order = prepared[index]
+        try:
+            await node_limiter.acquire()
+            await client.node.place_order(client.wallet, order)
+            submit_times[index] = time.perf_counter()
+            order_id = await confirm_order_placement(client, market_order_id, order.good_til_block)
+            print(f"Order placed successfully: {order_id}")
+            record_order(leg["market"], order_id, leg["side"], leg["size"], leg["price"])
+            return {"status": "success", "order_id": order_id}
+        except Exception as e:
+            print(f"Error placing order: {e}")
+            return {"status": "failed", "error": str(e)}
+
+    results = await asyncio.gather(submit(0), submit(1))
+    if None not in submit_times:
+        print(f"Leg gap for {leg_1['market']}/{leg_2['market']}: {abs(submit_times[1] - submit_times[0]) * 1000:.1f} ms between submissions")
+
+    failed = [i for i, result in enumerate(results) if result["status"] == "failed"]
+    if len(failed) == 0:
+        return {"status": "success", "order_ids": [result["order_id"] for result in results]}
+
+    # Roll back the leg that went through once it has filled (the tracker cancels it if it does not)
+    if len(failed) == 1:
+        from func_fill_tracker import fill_tracker
+        filled = legs[1 - failed[0]]
+        status = await fill_tracker.track(client, results[1 - failed[0]]["order_id"])
+        if status == "CANCELED":
+            print(f"{filled['market']} leg canceled before filling, nothing to roll back")
+        else:
+            # Also close if the fill raced the timeout cancel; reduce-only does nothing on a flat position
+            close_side = "SELL" if filled["side"] == "BUY" else "BUY"
+            close_price = filled.get("failsafe_price")
+            if close_price is None:
+                close_price = market_registry.format_price(filled["market"], float(filled["price"]) * (1.05 if close_side == "BUY" else 0.95))
+            print(f"Rolling back {filled['market']} leg after {legs[failed[0]]['market']} leg failed")
+            rollback = await place_market_order(client, filled["market"], close_side, filled["size"], close_price, True)
+            if rollback["status"] == "failed":
+                print(f"Error rolling back {filled['market']}: {rollback['error']}")
+
+    return {"status": "failed", "error": "; ".join(results[i]["error"] for i in failed)}
+
 # Cancel All Open Orders
 async def cancel_all_orders(client):
     try:
@@ -167,10 +272,9 @@ async def abort_all_positions(client):
         await cancel_all_orders(client)
 
         # Fetch all available markets
-        markets_response = await client.indexer.markets.get_perpetual_markets()
-        if not markets_response or "markets" not in markets_response:
+        markets = await market_registry.get_markets(client)
+        if not markets:
             raise ValueError("Markets data is missing or invalid.")
-        markets = markets_response["markets"]
 
         # Fetch all open positions
         positions = await get_open_positions(client)
@@ -187,9 +291,8 @@ async def abort_all_positions(client):
                     print(f"Market data for {market} not found.")
                     continue
 
-                tick_size = markets[market]["tickSize"]
                 accept_price = price * 1.7 if side == "BUY" else price * 0.3  # Ensure order fills
-                accept_price = format_number(accept_price, tick_size)
+                accept_price = market_registry.format_price(market, accept_price)
 
                 # Place market order to close position
                 result = await place_market_order(client, market, side, pos["sumOpen"], accept_price, True)
@@ -199,9 +302,8 @@ async def abort_all_positions(client):
                 else:
                     print(f"Closed position for {market}: {result['order_id']}")
 
-            # Clear saved agents after aborting all positions
-            with open("bot_agents.json", "w") as f:
-                json.dump([], f)  # Only clears the file after successful closing of positions.
+            # Retire saved agents after aborting all positions
+            get_state_store().close_live_agents("ABORTED")
         else:
             print("No open positions found.")
     except Exception as e:
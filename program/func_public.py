@@ -1,77 +1,225 @@
-from constants import RESOLUTION
-from func_utils import get_ISO_times
-import pandas as pd
+from constants import RESOLUTION, MAX_CONCURRENT_REQUESTS, HISTORY_CANDLES, CANDLES_PER_REQUEST
+from func_utils import plan_candle_windows, count_candle_starts, next_candle_boundary, RESOLUTION_SECONDS
+from func_rate_limit import indexer_limiter
+from func_candle_store import get_candle_store, latest_closed_start
+from func_markets import market_registry
 import numpy as np
+import asyncio
 import time
+import tracemalloc
 
-# Get relevant time periods for ISO from and to
-ISO_TIMES = get_ISO_times()
+# Number of candles returned by get_candles_recent (indexer default page size)
+RECENT_CANDLES = 100
+
+# Closed candles cached until the next candle boundary, keyed by (market, resolution)
+_recent_cache = {}
+_recent_inflight = {}
+_recent_last_started = {}
 
 # Get Recent Candles
 async def get_candles_recent(client, market):
-    # Define output
-    close_prices = []
+    """
+    Returns recent close prices, ending with the candle still in progress.
+    Closed candles are downloaded at most once per candle, with concurrent callers for the
+    same market sharing a single in-flight request; the open candle is fetched on every call.
+    Reads from the price stream instead when streaming mode is running.
+    """
+    price_stream = getattr(client, "price_stream", None)
+    if price_stream is not None:
+        close_prices = price_stream.get_closes(market)
+        if close_prices is not None:
+            return close_prices
+
+    key = (market, RESOLUTION)
+    cached = _recent_cache.get(key)
+    if cached is not None and time.time() < cached[0]:
+        closed, last_started = cached[1], cached[2]
+        live = await fetch_candles_live(client, market, last_started)
+    else:
+        task = _recent_inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_load_candles_recent(client, market, key))
+            _recent_inflight[key] = task
+        closed, last_started, live = await asyncio.shield(task)
+    _recent_last_started[key] = live[-1][0] if len(live) > 0 else last_started
+    return np.concatenate((closed, [close for _, close in live]))[-RECENT_CANDLES:]
+
+# Start of the last candle returned by get_candles_recent
+def last_candle_start(client, market):
+    """
+    Returns the startedAt of the newest candle behind the last get_candles_recent result for
+    market, or None if it has not been fetched. Tells an open last candle from a closed one.
+    """
+    price_stream = getattr(client, "price_stream", None)
+    if price_stream is not None and price_stream.get_closes(market) is not None:
+        return max(price_stream.candles[market])
+    return _recent_last_started.get((market, RESOLUTION))
+
+# Fetch recent candles and cache the closed ones until the next candle closes
+async def _load_candles_recent(client, market, key):
+    try:
+        candles = await fetch_candles_recent(client, market)
+        last_closed = latest_closed_start(RESOLUTION)
+        closed = [(started_at, close) for started_at, close in candles if started_at <= last_closed][-RECENT_CANDLES:]
+        closed_prices = np.array([close for _, close in closed], dtype=np.float64)
+        closed_prices.flags.writeable = False
+        last_started = closed[-1][0] if len(closed) > 0 else ""
+        _recent_cache[key] = (next_candle_boundary(RESOLUTION), closed_prices, last_started)
+        live = [(started_at, close) for started_at, close in candles if started_at > last_started]
+        return closed_prices, last_started, live
+    finally:
+        del _recent_inflight[key]
+
+# Clear Recent Candle Cache
+def clear_candles_cache():
+    _recent_cache.clear()
+    _recent_last_started.clear()
+
+# Fetch Live Candles
+async def fetch_candles_live(client, market, after):
+    """
+    Returns the newest candles that started after `after` as (startedAt, close) tuples: the
+    candle in progress, plus a just-closed candle the indexer had not published when the cache filled.
+    """
+    await indexer_limiter.acquire()
+    response = await client.indexer.markets.get_perpetual_market_candles(market=market, resolution=RESOLUTION, limit=2)
+    candles = sorted((c for c in response["candles"] if c["startedAt"] > after), key=lambda c: c["startedAt"])
+    return [(c["startedAt"], float(c["close"])) for c in candles]
+
+# Fetch Recent Candles
+async def fetch_candles_recent(client, market):
+    """
+    Returns the most recent candles as (startedAt, close) tuples in ascending time order,
+    including the candle still in progress.
+    """
+    # Only top up candles newer than the last stored candle
+    store = get_candle_store()
+    from_iso = None
+    if store is not None:
+        last_stored = store.last_started_at(market, RESOLUTION)
+        if last_stored is not None and count_candle_starts(last_stored, latest_closed_start(RESOLUTION), RESOLUTION) <= RECENT_CANDLES:
+            from_iso = last_stored
 
     # Protect API
-    time.sleep(0.2)
+    await indexer_limiter.acquire()
 
     # Get Prices from DYDX V4
-    response = await client.indexer.markets.get_perpetual_market_candles(
-        market=market, 
-        resolution=RESOLUTION
-    )
+    if from_iso is not None:
+        response = await client.indexer.markets.get_perpetual_market_candles(
+            market=market,
+            resolution=RESOLUTION,
+            from_iso=from_iso
+        )
+    else:
+        response = await client.indexer.markets.get_perpetual_market_candles(
+            market=market, 
+            resolution=RESOLUTION
+        )
 
     # Candles
-    candles = response
+    candles = response["candles"]
 
-    # Structure data
-    for candle in candles["candles"]:
-        close_prices.append(candle["close"])
+    # Read closed candles from the store and add the candle still in progress
+    if store is not None:
+        store.upsert(market, RESOLUTION, candles)
+        rows = store.load(market, RESOLUTION, limit=RECENT_CANDLES)
+        last_stored = rows[-1][0] if len(rows) > 0 else ""
+        open_candles = sorted((c for c in candles if c["startedAt"] > last_stored), key=lambda c: c["startedAt"])
+        rows.extend((c["startedAt"], float(c["close"])) for c in open_candles)
+        return rows[-RECENT_CANDLES:]
 
-    # Construct and return close price series
-    close_prices.reverse()
-    prices_result = np.array(close_prices).astype(np.float64)
-    return prices_result
+    # Structure data, oldest first
+    return [(c["startedAt"], float(c["close"])) for c in reversed(candles)]
 
 # Get Historical Candles
-async def get_candles_historical(client, market):
+async def get_candles_historical(client, market, lookback=HISTORY_CANDLES):
+    """
+    Fetches the last `lookback` candles for a market, requesting every window concurrently.
+    Windows are planned at call time from the lookback and RESOLUTION.
+    """
     # Define output
     close_prices = []
+    store = get_candle_store()
+    windows = plan_candle_windows(lookback, RESOLUTION, CANDLES_PER_REQUEST)
 
-    # Extract historical price data for each timeframe
-    for timeframe in ISO_TIMES.keys():
-        # Confirm times needed
-        tf_obj = ISO_TIMES[timeframe]
-        from_iso = tf_obj["from_iso"] + ".000Z"
-        to_iso = tf_obj["to_iso"] + ".000Z"
+    # Fetch one window
+    async def fetch_window(from_iso, to_iso):
+        # Skip or shorten windows already held in the store
+        if store is not None:
+            from_iso = store.fetch_from(market, RESOLUTION, from_iso, to_iso)
+            if from_iso is None:
+                return []
 
         # Protect rate limits
-        time.sleep(0.2)
+        await indexer_limiter.acquire()
 
         response = await client.indexer.markets.get_perpetual_market_candles(
             market=market, 
             resolution=RESOLUTION, 
             from_iso=from_iso,
             to_iso=to_iso,
-            limit=100
+            limit=CANDLES_PER_REQUEST
         )
+        return response["candles"]
 
-        candles = response
+    # Extract historical price data for every window at once
+    responses = await asyncio.gather(*(fetch_window(w["from_iso"], w["to_iso"]) for w in windows))
 
-        # Structure data
-        for candle in candles["candles"]:
-            close_prices.append({"datetime": candle["startedAt"], market: candle["close"]})
+    # Save to store and read the full history back
+    if store is not None:
+        for candles in responses:
+            store.upsert(market, RESOLUTION, candles)
+        return candles_to_arrays(store.load(market, RESOLUTION, from_iso=windows[-1]["from_iso"]))
 
-    # Construct and return DataFrame
-    close_prices.reverse()
-    return close_prices
+    # Structure data
+    for candles in responses:
+        for candle in candles:
+            close_prices.append((candle["startedAt"], candle["close"]))
+
+    # Construct and return arrays
+    close_prices.sort(key=lambda c: c[0])
+    return candles_to_arrays(close_prices)
 
-# Get Markets
+# Parse (startedAt, close) pairs into timestamp and float64 arrays
+def candles_to_arrays(candles):
+    """
+    Returns (timestamps, closes) as datetime64[s] and float64 arrays.
+    """
+    timestamps = np.array([started_at[:19] for started_at, _ in candles], dtype="datetime64[s]")
+    closes = np.array([close for _, close in candles], dtype=np.float64)
+    return timestamps, closes
+
+# Get Markets (always fresh, also warms the market registry)
 async def get_markets(client):
-    return await client.indexer.markets.get_perpetual_markets()
+    await market_registry.refresh(client)
+    return {"markets": market_registry.markets}
+
+# Fetch historical candles for many markets concurrently
+async def fetch_candles_concurrently(client, markets, concurrency=MAX_CONCURRENT_REQUESTS, lookback=HISTORY_CANDLES):
+    """
+    Fetches historical candles for all markets with at most `concurrency` markets in flight.
+    Request pacing is handled by the shared indexer rate limiter.
+    Returns a list of (timestamps, closes) per market (None if the market failed).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    completed = 0
+
+    async def fetch(market):
+        nonlocal completed
+        async with semaphore:
+            try:
+                close_prices = await get_candles_historical(client, market, lookback)
+            except Exception as e:
+                print(f"Failed to fetch {market} - {e}")
+                close_prices = None
+        completed += 1
+        print(f"Extracted prices for {completed} of {len(markets)} tokens for {market}")
+        return close_prices
+
+    return await asyncio.gather(*(fetch(market) for market in markets))
 
 # Construct market prices
-async def construct_market_prices(client, limit=None):
+async def construct_market_prices(client, limit=None, concurrency=MAX_CONCURRENT_REQUESTS, lookback=HISTORY_CANDLES):
     # Declare variables
     tradeable_markets = []
     markets = await get_markets(client)
@@ -86,29 +234,75 @@ async def construct_market_prices(client, limit=None):
     if limit is not None:
         tradeable_markets = tradeable_markets[:limit]
 
-    # Set initial DataFrame with the first market's historical candles
-    close_prices = await get_candles_historical(client, tradeable_markets[0])
-    df = pd.DataFrame(close_prices)
-    df.set_index("datetime", inplace=True)
-
-    # Append other prices to DataFrame
-    for (i, market) in enumerate(tradeable_markets):
-        print(f"Extracting prices for {i + 1} of {len(tradeable_markets)} tokens for {market}")
-        close_prices_add = await get_candles_historical(client, market)
-        df_add = pd.DataFrame(close_prices_add)
-        try:
-            df_add.set_index("datetime", inplace=True)
-            df = pd.merge(df, df_add, how="outer", on="datetime", copy=False)
-        except Exception as e:
-            print(f"Failed to add {market} - {e}")
-        del df_add
-
-    # Check any columns with NaNs
-    nans = df.columns[df.isna().any()].tolist()
+    # Fetch all markets concurrently
+    all_close_prices = await fetch_candles_concurrently(client, tradeable_markets, concurrency, lookback)
+
+    # Build price matrix in a single pass
+    return assemble_price_matrix(tradeable_markets, all_close_prices)
+
+# Assemble price matrix
+def assemble_price_matrix(markets, histories):
+    """
+    Builds the wide close price DataFrame in one allocation.
+    Each market's closes are written straight into a float64 matrix on a shared DatetimeIndex,
+    then columns with missing candles are dropped. Reports build time and peak memory.
+    """
+    start_time = time.perf_counter()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    # Keep markets which returned candles
+    columns = []
+    series = []
+    for market, history in zip(markets, histories):
+        if history is None or len(history[0]) == 0:
+            print(f"Failed to add {market} - no candles returned")
+            continue
+        columns.append(market)
+        series.append(history)
+
+    if len(columns) == 0:
+        if not tracing:
+            tracemalloc.stop()
+        return None
+
+    # Shared index covering every candle returned
+    step = np.timedelta64(RESOLUTION_SECONDS[RESOLUTION], "s")
+    first = min(timestamps[0] for timestamps, _ in series)
+    last = max(timestamps[-1] for timestamps, _ in series)
+    n_rows = int((last - first) // step) + 1
+
+    # Fill matrix
+    matrix = np.full((n_rows, len(columns)), np.nan, dtype=np.float64)
+    for col, (timestamps, closes) in enumerate(series):
+        rows = ((timestamps - first) // step).astype(np.int64)
+        matrix[rows, col] = closes
+
+    # Drop times no market traded, then markets with any missing candle
+    matrix_rows = ~np.isnan(matrix).all(axis=1)
+    matrix_cols = ~np.isnan(matrix[matrix_rows]).any(axis=0)
+    nans = [market for market, keep in zip(columns, matrix_cols) if not keep]
     if len(nans) > 0:
         print("Dropping columns: ")
         print(nans)
-        df.drop(columns=nans, inplace=True)
+
+    import pandas as pd
+    index = pd.DatetimeIndex(first + step * np.flatnonzero(matrix_rows), name="datetime")
+    df = pd.DataFrame(
+        matrix[np.ix_(matrix_rows, matrix_cols)],
+        index=index,
+        columns=[market for market, keep in zip(columns, matrix_cols) if keep],
+        copy=False,
+    )
+
+    # Report
+    _, peak = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+    elapsed = time.perf_counter() - start_time
+    print(f"Price matrix {df.shape[0]}x{df.shape[1]} built in {elapsed:.3f}s (peak memory {peak / 1e6:.1f} MB)")
 
     # Return result
     return df
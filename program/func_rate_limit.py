@@ -0,0 +1,47 @@
+from constants import INDEXER_RATE_LIMIT, INDEXER_RATE_BURST, NODE_RATE_LIMIT, NODE_RATE_BURST
+import asyncio
+import time
+
+# Token Bucket Rate Limiter
+class TokenBucket:
+    """
+    Async token bucket allowing `rate` requests per second with bursts of up to `capacity`.
+    Callers await acquire() before each request instead of blocking with time.sleep.
+    The lock is created on the loop that uses it, so the shared limiter survives asyncio.run() calls.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = None
+        self.loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _get_lock(self):
+        # Locks are bound to the event loop they are first used on
+        loop = asyncio.get_running_loop()
+        if self.lock is None or self.loop is not loop:
+            self.lock = asyncio.Lock()
+            self.loop = loop
+        return self.lock
+
+    async def acquire(self, tokens=1):
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+# Shared limiter for all indexer requests
+indexer_limiter = TokenBucket(INDEXER_RATE_LIMIT, INDEXER_RATE_BURST)
+
+# Shared limiter for all order and cancel submissions to the node
+node_limiter = TokenBucket(NODE_RATE_LIMIT, NODE_RATE_BURST)
@@ -0,0 +1,102 @@
+from constants import RESOLUTION, EXIT_CHECK_INTERVAL, CANDLE_CLOSE_DELAY
+from func_utils import next_candle_boundary, RESOLUTION_SECONDS
+from func_state_store import get_state_store
+from func_rate_limit import indexer_limiter
+import asyncio
+import time
+import os
+
+# Candle Scheduler Class
+class CandleScheduler:
+    """
+    Paces the main loop on candle closes. wait() sleeps until the next `resolution` boundary
+    (plus `close_delay` seconds for the indexer to publish the closed candle) and returns
+    "candle", or until the next intra-candle exit tick and returns "tick". Jobs are skipped
+    when their inputs match the last successful run.
+    """
+
+    def __init__(self, resolution=RESOLUTION, exit_interval=EXIT_CHECK_INTERVAL, close_delay=CANDLE_CLOSE_DELAY):
+        self.resolution = resolution
+        self.exit_interval = exit_interval
+        self.close_delay = close_delay
+        self.last_inputs = {}
+
+    def next_wakeup(self, now=None):
+        """
+        Returns (epoch time, kind) of the next wakeup.
+        """
+        now = time.time() if now is None else now
+        step = RESOLUTION_SECONDS[self.resolution]
+        candle_at = next_candle_boundary(self.resolution, now - self.close_delay) + self.close_delay
+        if self.exit_interval and self.exit_interval < step:
+            tick_at = now + self.exit_interval
+            if tick_at < candle_at:
+                return tick_at, "tick"
+        return candle_at, "candle"
+
+    async def wait(self, cycle_started=None):
+        """
+        Reports how long the cycle took and how much slack is left, then sleeps until the next wakeup.
+        """
+        now = time.time()
+        wake_at, kind = self.next_wakeup(now)
+        if cycle_started is not None:
+            print(f"Cycle took {now - cycle_started:.2f}s, {wake_at - now:.1f}s slack until next {kind}")
+        await asyncio.sleep(max(0, wake_at - time.time()))
+        return kind
+
+    def changed(self, job, inputs):
+        """
+        Returns False if the inputs match the job's last successful run.
+        """
+        if self.last_inputs.get(job) == inputs:
+            print(f"Skipping {job}: inputs unchanged")
+            return False
+        return True
+
+    def mark(self, job, inputs):
+        """
+        Records the inputs of a run that succeeded, so a failed run is retried on the next wakeup.
+        """
+        self.last_inputs[job] = inputs
+
+# Inputs of each job
+def candle_key(resolution=RESOLUTION):
+    return next_candle_boundary(resolution)
+
+def stream_prices(client, markets):
+    # Latest streamed closes, or None when not streaming
+    if getattr(client, "price_stream", None) is None:
+        return None
+    closes = [client.price_stream.get_closes(market) for market in markets]
+    return tuple(None if c is None or len(c) == 0 else float(c[-1]) for c in closes)
+
+async def oracle_prices(client, markets):
+    # One indexer request for a fresh price snapshot between candle closes in REST mode
+    if len(markets) == 0:
+        return ()
+    try:
+        await indexer_limiter.acquire()
+        response = await client.indexer.markets.get_perpetual_markets()
+    except Exception as e:
+        print(f"Error fetching oracle prices: {e}")
+        return None
+    return tuple(response["markets"].get(market, {}).get("oraclePrice") for market in markets)
+
+async def exit_inputs(client):
+    store = get_state_store()
+    agents = tuple(agent["id"] for agent in store.get_agents("LIVE"))
+    markets = store.live_markets()
+    prices = stream_prices(client, markets)
+    if prices is None:
+        prices = await oracle_prices(client, markets)
+    return (candle_key(), agents, prices)
+
+def entry_inputs(client, pairs_path="cointegrated_pairs.csv"):
+    try:
+        pairs_mtime = os.path.getmtime(pairs_path)
+    except OSError:
+        pairs_mtime = None
+    agents = tuple(agent["id"] for agent in get_state_store().get_agents("LIVE"))
+    markets = client.price_stream.markets if getattr(client, "price_stream", None) is not None else []
+    return (candle_key(), pairs_mtime, agents, stream_prices(client, markets))
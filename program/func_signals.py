@@ -0,0 +1,164 @@
+from constants import ZSCORE_THRESH, USE_ONLINE_HEDGE_RATIO, RESOLUTION, WINDOW
+from func_public import get_candles_recent, last_candle_start
+from func_cointegration import ZScoreStream, latest_zscore
+from func_hedge_ratio import hedge_book
+from func_utils import RESOLUTION_SECONDS, parse_iso
+import numpy as np
+import asyncio
+import time
+
+# Recent price matrix
+async def fetch_recent_prices(client, markets):
+    """
+    Fetches recent closes once per unique market, concurrently.
+    Returns (columns, prices) where columns maps market to its column in the (T, N) prices matrix.
+    T is the most common series length; markets with shorter series are left out.
+    """
+    unique_markets = sorted(set(markets))
+    results = await asyncio.gather(*(get_candles_recent(client, market) for market in unique_markets), return_exceptions=True)
+
+    series = {}
+    for market, result in zip(unique_markets, results):
+        if isinstance(result, Exception):
+            print(f"Error fetching prices for {market}: {result}")
+        elif len(result) > 0:
+            series[market] = result
+
+    if len(series) == 0:
+        return {}, np.empty((0, 0))
+
+    lengths = [len(s) for s in series.values()]
+    n_rows = max(set(lengths), key=lengths.count)
+    kept = [market for market, s in series.items() if len(s) >= n_rows]
+    skipped = [market for market in series if market not in kept]
+    if len(skipped) > 0:
+        print(f"Skipping markets with short price history: {skipped}")
+
+    prices = np.empty((n_rows, len(kept)), dtype=np.float64)
+    for col, market in enumerate(kept):
+        prices[:, col] = series[market][-n_rows:]
+    return {market: col for col, market in enumerate(kept)}, prices
+
+# Z-Score Book Class
+class ZScoreBook:
+    """
+    One ZScoreStream per spread, keyed by (market_1, market_2, hedge_ratio). Each closed candle
+    is pushed into its stream once, so a score costs O(1) instead of a pass over the window.
+    The last point of a spread is always scored as provisional against the closed points before
+    it, which matches latest_zscore. Streams left a candle behind are dropped.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.streams = {}
+        self.last_closed = {}
+        self.latest = None
+
+    def score(self, key, spread, last_started):
+        """
+        Returns the latest z-score of `spread`, whose last point is the candle that started at
+        `last_started` (an indexer startedAt). Without a start time the window is recomputed.
+        """
+        if last_started is None:
+            return latest_zscore(spread, self.window)
+        step = RESOLUTION_SECONDS[RESOLUTION]
+        last_closed = int(parse_iso(last_started).timestamp()) - step
+        closed = spread[:-1]
+
+        if self.latest is None or last_closed > self.latest:
+            self.latest = last_closed
+            for stale in [k for k, t in self.last_closed.items() if t < last_closed - step]:
+                del self.streams[stale]
+                del self.last_closed[stale]
+
+        stream = self.streams.get(key)
+        behind = None if stream is None else (last_closed - self.last_closed[key]) // step
+        if behind is None or behind < 0 or behind >= len(closed):
+            # New spread, or too far behind to catch up candle by candle
+            stream = ZScoreStream(self.window)
+            for value in closed[-(self.window - 1):]:
+                stream.push(value)
+            self.streams[key] = stream
+        else:
+            for k in range(int(behind), 0, -1):
+                stream.push(closed[-k])
+        self.last_closed[key] = last_closed
+        return stream.score(spread[-1])
+
+    def scores(self, client, market_pairs, hedge_ratios, spreads):
+        """
+        Latest z-score of each column of a (T, K) spread matrix built from market_pairs and hedge_ratios.
+        """
+        z_scores = np.empty(len(market_pairs), dtype=np.float64)
+        for k, (market_1, market_2) in enumerate(market_pairs):
+            last_started = last_candle_start(client, market_1)
+            if last_started != last_candle_start(client, market_2):
+                last_started = None
+            z_scores[k] = self.score((market_1, market_2, float(hedge_ratios[k])), spreads[:, k], last_started)
+        return z_scores
+
+# Shared book
+zscore_book = ZScoreBook()
+
+# Evaluate signals for all pairs
+async def evaluate_pair_signals(client, df_pairs, available_markets, zscore_thresh=ZSCORE_THRESH):
+    """
+    Computes the latest z-score of every cointegrated pair as one matrix operation.
+    Returns the pairs at or beyond zscore_thresh, ranked by absolute z-score (strongest first).
+    """
+    start_time = time.perf_counter()
+
+    # Valid pairs only
+    pairs = []
+    for _, row in df_pairs.iterrows():
+        base_market = row["base_market"]
+        quote_market = row["quote_market"]
+        if base_market not in available_markets or quote_market not in available_markets:
+            print(f"Skipping invalid or unavailable market pair: {base_market}/{quote_market}")
+            continue
+        pairs.append(row)
+
+    # One fetch per unique market
+    markets = [row["base_market"] for row in pairs] + [row["quote_market"] for row in pairs]
+    columns, prices = await fetch_recent_prices(client, markets)
+    pairs = [row for row in pairs if row["base_market"] in columns and row["quote_market"] in columns]
+    if len(pairs) == 0:
+        return []
+
+    base_idx = np.array([columns[row["base_market"]] for row in pairs])
+    quote_idx = np.array([columns[row["quote_market"]] for row in pairs])
+    hedge_ratios = np.array([row["hedge_ratio"] for row in pairs], dtype=np.float64)
+
+    # Update hedge ratios with any newly closed candles, when both series end on the same candle
+    if USE_ONLINE_HEDGE_RATIO:
+        for k, row in enumerate(pairs):
+            last_started = last_candle_start(client, row["base_market"])
+            if last_started != last_candle_start(client, row["quote_market"]):
+                continue
+            hedge_ratios[k] = hedge_book.update(
+                row["base_market"], row["quote_market"], prices[:, base_idx[k]], prices[:, quote_idx[k]], hedge_ratios[k], last_started
+            )
+
+    # Spreads and latest z-scores for every pair at once
+    spreads = prices[:, base_idx] - hedge_ratios * prices[:, quote_idx]
+    z_scores = zscore_book.scores(client, [(row["base_market"], row["quote_market"]) for row in pairs], hedge_ratios, spreads)
+
+    # Rank triggered pairs
+    triggered = np.flatnonzero(np.abs(np.nan_to_num(z_scores)) >= zscore_thresh)
+    triggered = triggered[np.argsort(-np.abs(z_scores[triggered]), kind="stable")]
+    candidates = [
+        {
+            "base_market": pairs[k]["base_market"],
+            "quote_market": pairs[k]["quote_market"],
+            "hedge_ratio": float(hedge_ratios[k]),
+            "half_life": pairs[k]["half_life"],
+            "z_score": float(z_scores[k]),
+            "base_price": float(prices[-1, base_idx[k]]),
+            "quote_price": float(prices[-1, quote_idx[k]]),
+        }
+        for k in triggered
+    ]
+
+    print(f"Evaluated {len(pairs)} pairs over {len(columns)} markets in {time.perf_counter() - start_time:.3f}s, "
+          f"{len(candidates)} signals")
+    return candidates
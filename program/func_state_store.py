@@ -0,0 +1,166 @@
+from constants import STATE_STORE_PATH
+import sqlite3
+import json
+import time
+
+AGENT_COLUMNS = (
+    "market_1", "market_2", "order_id_m1", "order_id_m2", "order_m1_size", "order_m2_size",
+    "order_m1_side", "order_m2_side", "price_m1", "price_m2", "hedge_ratio", "z_score", "half_life", "pair_status",
+)
+
+# State Store Class
+class StateStore:
+    """
+    SQLite store of placed orders and pair agents, replacing bot_agents.json.
+    Runs in WAL mode so every write is a small append that commits atomically; a crash
+    mid-write leaves the last committed state intact. Rows are updated in place by status
+    rather than the whole book being rewritten.
+    """
+
+    def __init__(self, path=STATE_STORE_PATH, legacy_path="bot_agents.json"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS orders (
+                order_id TEXT PRIMARY KEY,
+                market TEXT NOT NULL,
+                side TEXT NOT NULL,
+                size REAL NOT NULL,
+                price REAL NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS orders_market_status ON orders (market, status);
+            CREATE INDEX IF NOT EXISTS orders_status ON orders (status);
+
+            CREATE TABLE IF NOT EXISTS pair_agents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                market_1 TEXT NOT NULL,
+                market_2 TEXT NOT NULL,
+                order_id_m1 TEXT,
+                order_id_m2 TEXT,
+                order_m1_size REAL,
+                order_m2_size REAL,
+                order_m1_side TEXT,
+                order_m2_side TEXT,
+                price_m1 REAL,
+                price_m2 REAL,
+                hedge_ratio REAL,
+                z_score REAL,
+                half_life REAL,
+                pair_status TEXT NOT NULL,
+                opened_at REAL NOT NULL,
+                closed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS pair_agents_status ON pair_agents (pair_status);
+            CREATE INDEX IF NOT EXISTS pair_agents_market_1 ON pair_agents (market_1, pair_status);
+            CREATE INDEX IF NOT EXISTS pair_agents_market_2 ON pair_agents (market_2, pair_status);
+            """
+        )
+        self.conn.commit()
+        self.import_legacy(legacy_path)
+
+    def import_legacy(self, legacy_path):
+        """
+        Copies an existing bot_agents.json into the store once. The file itself is left untouched.
+        """
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] > 0:
+            return
+        try:
+            with open(legacy_path, "r") as f:
+                records = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            records = []
+
+        with self.conn:
+            for record in records:
+                if "market_1" in record:
+                    self.add_agent(record, commit=False)
+                elif record.get("order_id"):
+                    self.record_order(record["order_id"], record["market"], record["side"], record["size"], record["price"], commit=False)
+            self.conn.execute("PRAGMA user_version = 1")
+        if len(records) > 0:
+            print(f"Imported {len(records)} records from {legacy_path} into {self.path}")
+
+    # Orders
+    def record_order(self, order_id, market, side, size, price, status="PLACED", commit=True):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (order_id, market, side, float(size), float(price), status, now, now),
+        )
+        if commit:
+            self.conn.commit()
+
+    def set_order_status(self, order_id, status):
+        self.conn.execute("UPDATE orders SET status = ?, updated_at = ? WHERE order_id = ?", (status, time.time(), order_id))
+        self.conn.commit()
+
+    def get_orders(self, market=None, status=None):
+        query = "SELECT * FROM orders WHERE 1 = 1"
+        params = []
+        if market is not None:
+            query += " AND market = ?"
+            params.append(market)
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        return [dict(row) for row in self.conn.execute(query + " ORDER BY created_at", params)]
+
+    # Pair agents
+    def add_agent(self, agent, commit=True):
+        """
+        Saves a pair agent dict (the bot_agents.json shape). Returns its id.
+        """
+        values = [agent.get(column) for column in AGENT_COLUMNS]
+        values[AGENT_COLUMNS.index("pair_status")] = agent.get("pair_status") or "LIVE"
+        cursor = self.conn.execute(
+            f"INSERT INTO pair_agents ({', '.join(AGENT_COLUMNS)}, opened_at) VALUES ({', '.join('?' * len(AGENT_COLUMNS))}, ?)",
+            (*values, time.time()),
+        )
+        if commit:
+            self.conn.commit()
+        return cursor.lastrowid
+
+    def get_agents(self, status="LIVE", market=None):
+        query = "SELECT * FROM pair_agents WHERE pair_status = ?"
+        params = [status]
+        if market is not None:
+            query += " AND (market_1 = ? OR market_2 = ?)"
+            params += [market, market]
+        return [dict(row) for row in self.conn.execute(query + " ORDER BY id", params)]
+
+    def set_agent_status(self, agent_id, status):
+        closed_at = time.time() if status != "LIVE" else None
+        self.conn.execute("UPDATE pair_agents SET pair_status = ?, closed_at = ? WHERE id = ?", (status, closed_at, agent_id))
+        self.conn.commit()
+
+    def close_live_agents(self, status="CLOSED"):
+        self.conn.execute("UPDATE pair_agents SET pair_status = ?, closed_at = ? WHERE pair_status = 'LIVE'", (status, time.time()))
+        self.conn.commit()
+
+    def live_markets(self):
+        rows = self.conn.execute(
+            "SELECT market_1 FROM pair_agents WHERE pair_status = 'LIVE' UNION SELECT market_2 FROM pair_agents WHERE pair_status = 'LIVE'"
+        )
+        return sorted(row[0] for row in rows)
+
+    def compact(self):
+        """
+        Folds the write-ahead log back into the database file.
+        """
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+# Shared store, opened on first use
+_state_store = None
+
+def get_state_store():
+    global _state_store
+    if _state_store is None:
+        _state_store = StateStore()
+    return _state_store
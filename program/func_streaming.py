@@ -0,0 +1,152 @@
+from constants import RESOLUTION, MARKET_DATA_MODE, INDEXER_WS_ENDPOINT_TESTNET, INDEXER_WS_ENDPOINT_MAINNET
+from func_utils import RESOLUTION_SECONDS, parse_iso
+from func_state_store import get_state_store
+import numpy as np
+import websockets
+import asyncio
+import json
+import csv
+
+# Price Stream Class
+class PriceStream:
+    """
+    Streams candles and trades from the indexer WebSocket into rolling close buffers.
+    Candle messages fill and update the buffers, trades keep the latest close current
+    between candle updates. Reconnects with backoff if the connection drops.
+    """
+
+    def __init__(self, markets, url=None, resolution=RESOLUTION, size=100):
+        self.markets = sorted(set(markets))
+        self.url = url or (INDEXER_WS_ENDPOINT_MAINNET if MARKET_DATA_MODE != "TESTNET" else INDEXER_WS_ENDPOINT_TESTNET)
+        self.resolution = resolution
+        self.size = size
+        self.candles = {market: {} for market in self.markets}
+        self.ready = set()
+        self.task = None
+        self.ready_event = asyncio.Event()
+
+    # Buffers
+    def update_candle(self, market, candle):
+        buffer = self.candles.setdefault(market, {})
+        buffer[candle["startedAt"]] = float(candle["close"])
+        if len(buffer) > self.size:
+            for started_at in sorted(buffer)[:len(buffer) - self.size]:
+                del buffer[started_at]
+
+    def update_trade(self, market, trade):
+        # Trades move the close of the candle they fall in
+        buffer = self.candles.get(market)
+        if not buffer:
+            return
+        latest = max(buffer)
+        step = RESOLUTION_SECONDS[self.resolution]
+        traded_at = parse_iso(trade["createdAt"]).timestamp()
+        latest_start = parse_iso(latest).timestamp()
+        if latest_start <= traded_at < latest_start + step:
+            buffer[latest] = float(trade["price"])
+
+    def get_closes(self, market):
+        """
+        Returns the buffered close prices in ascending time order, or None if not streamed yet.
+        """
+        if market not in self.ready:
+            return None
+        buffer = self.candles[market]
+        return np.array([buffer[started_at] for started_at in sorted(buffer)], dtype=np.float64)
+
+    # Messages
+    def on_message(self, message):
+        msg_type = message.get("type")
+        channel = message.get("channel")
+        if msg_type == "error":
+            print(f"Price stream error: {message.get('message')}")
+            return
+        if msg_type not in ("subscribed", "channel_data", "channel_batch_data"):
+            return
+
+        contents = message.get("contents")
+        updates = contents if msg_type == "channel_batch_data" else [contents]
+
+        if channel == "v4_candles":
+            market = message["id"].split("/")[0]
+            for update in updates:
+                for candle in update.get("candles", [update]):
+                    self.update_candle(market, candle)
+            if msg_type == "subscribed":
+                self.ready.add(market)
+                if self.ready.issuperset(self.markets):
+                    self.ready_event.set()
+
+        elif channel == "v4_trades" and msg_type != "subscribed":
+            market = message["id"]
+            for update in updates:
+                trades = update.get("trades", [])
+                if len(trades) > 0:
+                    self.update_trade(market, max(trades, key=lambda t: t["createdAt"]))
+
+    # Connection
+    async def subscribe(self, websocket):
+        for market in self.markets:
+            await websocket.send(json.dumps({"type": "subscribe", "channel": "v4_candles", "id": f"{market}/{self.resolution}"}))
+            await websocket.send(json.dumps({"type": "subscribe", "channel": "v4_trades", "id": market}))
+
+    async def run(self):
+        backoff = 1
+        while True:
+            try:
+                async with websockets.connect(self.url, max_size=None) as websocket:
+                    print(f"Price stream connected for {len(self.markets)} markets")
+                    backoff = 1
+                    await self.subscribe(websocket)
+                    async for raw in websocket:
+                        self.on_message(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Price stream disconnected: {e}. Reconnecting in {backoff}s")
+
+            # Buffers may have gaps after a drop, so wait for fresh snapshots
+            self.ready.clear()
+            self.ready_event.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def wait_ready(self, timeout=30):
+        try:
+            await asyncio.wait_for(self.ready_event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            print(f"Price stream ready for {len(self.ready)} of {len(self.markets)} markets")
+            return False
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+# Markets to stream
+def get_stream_markets(pairs_path="cointegrated_pairs.csv"):
+    """
+    Returns the markets in the cointegrated pairs file and in live pair agents.
+    """
+    markets = set()
+    try:
+        with open(pairs_path, newline="") as f:
+            for row in csv.DictReader(f):
+                markets.add(row["base_market"])
+                markets.add(row["quote_market"])
+    except FileNotFoundError:
+        pass
+
+    markets.update(get_state_store().live_markets())
+
+    return sorted(markets)
@@ -1,20 +1,42 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+import time
+
+# Quantizer for a tick or step size
+class Quantizer:
+    """
+    Rounds numbers to a tick or step size such as "0.001" and formats them with matching decimals.
+    Built once per size so formatting avoids re-parsing the size string on every order.
+    """
+
+    def __init__(self, step):
+        step_decimal = Decimal(str(step))
+        self.step = float(step_decimal)
+        self.decimals = max(0, -step_decimal.as_tuple().exponent)
+
+    def quantize(self, value: float) -> float:
+        if self.step <= 0:
+            return float(value)
+        return round(round(float(value) / self.step) * self.step, self.decimals)
+
+    def format(self, value: float) -> str:
+        if self.decimals == 0:
+            return f"{int(self.quantize(value))}"
+        return f"{self.quantize(value):.{self.decimals}f}"
+
+# Get cached quantizer
+@lru_cache(maxsize=None)
+def get_quantizer(step: str) -> Quantizer:
+    return Quantizer(step)
 
 # Format number to match desired decimal places
 def format_number(curr_num: float, match_num: float) -> str:
     """
-    Formats curr_num to match the decimal places of match_num.
+    Formats curr_num to the tick or step size given by match_num.
     Returns the correctly formatted string.
     """
-    curr_num_string = f"{curr_num}"
-    match_num_string = f"{match_num}"
-
-    if "." in match_num_string:
-        match_decimals = len(match_num_string.split(".")[1])
-        curr_num_string = f"{curr_num:.{match_decimals}f}"
-        return curr_num_string
-    else:
-        return f"{int(curr_num)}"
+    return get_quantizer(f"{match_num}").format(curr_num)
 
 # Format the timestamp to ISO format without microseconds
 def format_time(timestamp: datetime) -> str:
@@ -23,38 +45,63 @@ def format_time(timestamp: datetime) -> str:
     """
     return timestamp.replace(microsecond=0).isoformat()
 
-# Get ISO times for the past intervals
-def get_ISO_times() -> dict:
-    """
-    Generates timestamps for several date ranges to fetch historical data.
-    """
-    # Define the starting point
-    now = datetime.now()
-
-    # Calculate the time intervals (100 hours apart)
-    date_start_1 = now - timedelta(hours=100)
-    date_start_2 = date_start_1 - timedelta(hours=100)
-    date_start_3 = date_start_2 - timedelta(hours=100)
-    date_start_4 = date_start_3 - timedelta(hours=100)
-
-    # Create a dictionary of time ranges
-    times_dict = {
-        "range_1": {
-            "from_iso": format_time(date_start_1),
-            "to_iso": format_time(now),
-        },
-        "range_2": {
-            "from_iso": format_time(date_start_2),
-            "to_iso": format_time(date_start_1),
-        },
-        "range_3": {
-            "from_iso": format_time(date_start_3),
-            "to_iso": format_time(date_start_2),
-        },
-        "range_4": {
-            "from_iso": format_time(date_start_4),
-            "to_iso": format_time(date_start_3),
-        },
-    }
-
-    return times_dict
+# Candle length in seconds for each indexer resolution
+RESOLUTION_SECONDS = {
+    "1MIN": 60,
+    "5MINS": 300,
+    "15MINS": 900,
+    "30MINS": 1800,
+    "1HOUR": 3600,
+    "4HOURS": 14400,
+    "1DAY": 86400,
+}
+
+# Parse an indexer ISO timestamp
+def parse_iso(timestamp: str) -> datetime:
+    """
+    Parses an ISO timestamp such as 2024-07-01T12:00:00.000Z into a UTC datetime.
+    """
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).replace(tzinfo=timezone.utc)
+
+# Count candle start times within a range
+def count_candle_starts(from_iso: str, to_iso: str, resolution: str) -> int:
+    """
+    Returns how many candles of the given resolution start within [from_iso, to_iso].
+    """
+    step = RESOLUTION_SECONDS[resolution]
+    first = -(-int(parse_iso(from_iso).timestamp()) // step)
+    last = int(parse_iso(to_iso).timestamp()) // step
+    return max(0, last - first + 1)
+
+# Next candle boundary
+def next_candle_boundary(resolution: str, now: float = None) -> float:
+    """
+    Returns the epoch time (seconds) at which the current candle of the given resolution closes.
+    """
+    step = RESOLUTION_SECONDS[resolution]
+    now = time.time() if now is None else now
+    return (now // step + 1) * step
+
+# Plan candle request windows
+def plan_candle_windows(lookback: int, resolution: str, page_size: int = 100, now: datetime = None) -> list:
+    """
+    Splits the last `lookback` candles (including the one in progress) into non-overlapping
+    windows of at most `page_size` candles, newest first, aligned to candle boundaries.
+    Returns a list of {"from_iso", "to_iso"} dicts in indexer format, e.g. 2024-07-01T12:00:00.000Z.
+    """
+    step = RESOLUTION_SECONDS[resolution]
+    now = now or datetime.now(timezone.utc)
+    current_start = int(now.timestamp()) // step * step
+    oldest_start = current_start - (lookback - 1) * step
+
+    windows = []
+    to_start = current_start
+    while to_start >= oldest_start:
+        from_start = max(oldest_start, to_start - (page_size - 1) * step)
+        windows.append({
+            "from_iso": datetime.fromtimestamp(from_start, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "to_iso": datetime.fromtimestamp(to_start, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        })
+        to_start = from_start - step
+
+    return windows
@@ -2,15 +2,19 @@ import asyncio
 import time
 import threading
 import sys
-from constants import ABORT_ALL_POSITIONS, FIND_COINTEGRATED, PLACE_TRADES, MANAGE_EXITS
-from func_connections import connect_dydx
+from constants import ABORT_ALL_POSITIONS, FIND_COINTEGRATED, PLACE_TRADES, MANAGE_EXITS, STREAM_MARKET_DATA, DAEMON_MODE
+import constants
+from func_connections import connect_dydx, ensure_node
 from func_private import abort_all_positions
 from func_cointegration import store_cointegration_results
 from func_exit_pairs import manage_trade_exits
 from func_entry_pairs import open_positions
-from func_messaging import send_message
+from func_messaging import send_message, close_messaging
 from func_public import construct_market_prices  # Corrected import
 from func_private import abort_all_positions
+from func_streaming import PriceStream, get_stream_markets
+from func_scheduler import CandleScheduler, exit_inputs, entry_inputs
+from func_daemon import daemon, reload_constants, warm_up, shut_down
 
 
 # Spinner function
@@ -85,30 +89,77 @@ async def main():
             send_message(f"Error saving cointegrated pairs: {str(e)}")
             return  # Exit safely on saving failure
 
-    # Start the spinner
-    start_spinner()
+    # Stream market data for traded pairs and open positions
+    if STREAM_MARKET_DATA:
+        print("Starting price stream...")
+        client.price_stream = PriceStream(get_stream_markets())
+        client.price_stream.start()
+        await client.price_stream.wait_ready()
 
-    # Main loop to manage exits and trades
-    while True:
-        if MANAGE_EXITS:
+    # Connect once and keep state warm, stopping cleanly on SIGINT/SIGTERM
+    if DAEMON_MODE:
+        daemon.install()
+        await warm_up(client)
+    else:
+        # Start the spinner
+        start_spinner()
+
+    # Main loop to manage exits and trades, paced on candle closes
+    scheduler = CandleScheduler()
+    kind = "candle"
+    while not daemon.stopping():
+        cycle_started = time.time()
+
+        if DAEMON_MODE:
+            # Apply a SIGHUP reload between cycles
+            if daemon.reload_requested:
+                daemon.reload_requested = False
+                reload_constants()
+                scheduler = CandleScheduler(constants.RESOLUTION, constants.EXIT_CHECK_INTERVAL, constants.CANDLE_CLOSE_DELAY)
+
+            # Reconnect the node if the connection dropped
+            finished, _ = await daemon.unless_stopped(ensure_node(client))
+            if not finished:
+                break
+
+        inputs = await exit_inputs(client) if MANAGE_EXITS else None
+        if MANAGE_EXITS and scheduler.changed("exits", inputs):
             try:
                 print("Managing exits...")
                 await manage_trade_exits(client)
                 print("Exit management complete")
-                time.sleep(1)  # Ensure API rate-limiting is handled
+                scheduler.mark("exits", inputs)
             except Exception as e:
                 print(f"Error managing exiting positions: {str(e)}")
                 send_message(f"Error managing exiting positions: {str(e)}")
-                return  # Exit safely or retry
+                if not DAEMON_MODE:
+                    return  # Exit safely or retry
 
-        if PLACE_TRADES:
+        # Entries only change when a candle closes
+        inputs = entry_inputs(client) if PLACE_TRADES else None
+        if PLACE_TRADES and kind == "candle" and not daemon.stopping() and scheduler.changed("entries", inputs):
             try:
                 print("Finding trading opportunities...")
                 await open_positions(client)
                 print("Trades placed successfully")
+                scheduler.mark("entries", inputs)
             except Exception as e:
                 print(f"Error trading pairs: {str(e)}")
                 send_message(f"Error opening trades: {str(e)}")
-                return  # Exit safely or retry
+                if not DAEMON_MODE:
+                    return  # Exit safely or retry
+
+        _, kind = await daemon.unless_stopped(scheduler.wait(cycle_started))
+
+    await shut_down(client)
+    send_message("Bot stopped")
+
+# Run the bot and send any queued messages before exiting
+async def run():
+    try:
+        await main()
+    finally:
+        await close_messaging()
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# constants.py reads these from .env; placeholders let the bot modules import offline
+for name in ("DYDX_ADDRESS", "SECRET_PHRASE", "TELEGRAM_TOKEN", "TELEGRAM_CHAT_ID"):
+    os.environ.setdefault(name, "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
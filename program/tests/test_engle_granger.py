@@ -0,0 +1,56 @@
+from statsmodels.tsa.stattools import coint
+from func_engle_granger import engle_granger
+import numpy as np
+import pytest
+
+# Seeded synthetic pairs: (series_1, series_2)
+def make_pair(kind, seed, n=400):
+    rng = np.random.default_rng(seed)
+    series_2 = 100 + np.cumsum(rng.normal(size=n))
+    if kind == "cointegrated":
+        noise = np.zeros(n)
+        for t in range(1, n):
+            noise[t] = 0.5 * noise[t - 1] + rng.normal()
+        series_1 = 3 + 1.5 * series_2 + noise
+    elif kind == "random_walk":
+        series_1 = 50 + np.cumsum(rng.normal(size=n))
+    else:
+        series_1 = 1 + 2 * series_2
+    return series_1, series_2
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("kind", ["cointegrated", "random_walk"])
+def test_matches_statsmodels_coint(kind, seed):
+    series_1, series_2 = make_pair(kind, seed)
+    stat, pvalue, crit = engle_granger(series_1, series_2)
+    ref_stat, ref_pvalue, ref_crit = coint(series_1, series_2)
+
+    assert stat == pytest.approx(ref_stat, abs=1e-9)
+    assert pvalue == pytest.approx(ref_pvalue, abs=1e-9)
+    np.testing.assert_allclose(crit, ref_crit, rtol=1e-12)
+
+@pytest.mark.parametrize("lags", [0, 1, 4])
+def test_matches_statsmodels_coint_fixed_lags(lags):
+    series_1, series_2 = make_pair("cointegrated", 4)
+    stat, pvalue, _ = engle_granger(series_1, series_2, lags=lags)
+    ref_stat, ref_pvalue, _ = coint(series_1, series_2, maxlag=lags, autolag=None)
+
+    assert stat == pytest.approx(ref_stat, abs=1e-9)
+    assert pvalue == pytest.approx(ref_pvalue, abs=1e-9)
+
+@pytest.mark.filterwarnings("ignore::statsmodels.tools.sm_exceptions.CollinearityWarning")
+def test_collinear_series():
+    series_1, series_2 = make_pair("collinear", 5)
+    stat, pvalue, crit = engle_granger(series_1, series_2)
+    ref_stat, ref_pvalue, ref_crit = coint(series_1, series_2)
+
+    assert stat == -np.inf and ref_stat == -np.inf
+    assert pvalue == ref_pvalue == 0.0
+    np.testing.assert_allclose(crit, ref_crit, rtol=1e-12)
+
+def test_flags_match_cointegration():
+    cointegrated = engle_granger(*make_pair("cointegrated", 6))
+    random_walk = engle_granger(*make_pair("random_walk", 6))
+
+    assert cointegrated[1] < 0.05 and cointegrated[0] < cointegrated[2][1]
+    assert random_walk[1] > 0.05
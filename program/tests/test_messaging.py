@@ -0,0 +1,74 @@
+from fake_telegram import FakeTelegramServer
+from func_messaging import TelegramNotifier
+import asyncio
+
+# Run a test against a fake Telegram API on a free port
+def run_with_server(test, server_interval=0.0, **notifier_args):
+    async def main():
+        server = FakeTelegramServer(port=0, min_interval=server_interval)
+        await server.start()
+        host, port = server.runner.addresses[0][:2]
+        notifier_args.setdefault("digest_window", 0.05)
+        notifier_args.setdefault("min_interval", 0.0)
+        notifier = TelegramNotifier(token="test", chat_id="1", base_url=f"http://{host}:{port}", **notifier_args)
+        try:
+            await test(notifier, server)
+        finally:
+            await notifier.close()
+            await server.stop()
+    asyncio.run(main())
+
+def test_single_message_is_sent_as_is():
+    async def test(notifier, server):
+        assert notifier.send("hello") == "queued"
+        await notifier.flush()
+        assert server.messages == [("1", "hello")]
+    run_with_server(test)
+
+def test_burst_is_merged_into_one_digest():
+    async def test(notifier, server):
+        for text in ("a", "b", "c"):
+            notifier.send(text)
+        await notifier.flush()
+        assert server.messages == [("1", "3 messages:\n1. a\n2. b\n3. c")]
+    run_with_server(test)
+
+def test_digests_are_split_per_chat():
+    async def test(notifier, server):
+        notifier.send("a")
+        notifier.send("b", chat_id="2")
+        await notifier.flush()
+        assert sorted(server.messages) == [("1", "a"), ("2", "b")]
+    run_with_server(test)
+
+def test_full_queue_drops_and_reports():
+    async def test(notifier, server):
+        results = [notifier.send(text) for text in ("a", "b", "c", "d")]
+        assert results == ["queued", "queued", "dropped", "dropped"]
+        await notifier.flush()
+        assert server.messages == [("1", "3 messages:\n1. a\n2. b\n3. (2 messages dropped, notification queue full)")]
+        assert notifier.dropped == 0
+    run_with_server(test, queue_size=2)
+
+def test_rate_limited_chat_is_retried():
+    async def test(notifier, server):
+        notifier.send("first")
+        await notifier.flush()
+        notifier.send("second")
+        await notifier.flush()
+        assert server.messages == [("1", "first"), ("1", "second")]
+    run_with_server(test, server_interval=0.2)
+
+def test_close_sends_queued_messages():
+    async def test(notifier, server):
+        notifier.send("bye")
+        await notifier.close()
+        assert server.messages == [("1", "bye")]
+    run_with_server(test)
+
+def test_long_message_is_split():
+    async def test(notifier, server):
+        notifier.send("x" * 5000)
+        await notifier.flush()
+        assert [len(text) for _, text in server.messages] == [4096, 904]
+    run_with_server(test)
@@ -0,0 +1,87 @@
+from fake_indexer_ws import FakeIndexerServer
+from func_streaming import PriceStream
+import websockets
+import asyncio
+import time
+
+MARKETS = ["BTC-USD", "ETH-USD"]
+
+# Run a test against a fake indexer on a free port
+def run_with_server(test, interval=0.05):
+    async def main():
+        server = FakeIndexerServer(interval=interval)
+        connections = []
+
+        async def handler(websocket):
+            connections.append(websocket)
+            await server.handler(websocket)
+
+        async with websockets.serve(handler, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            stream = PriceStream(MARKETS, url=f"ws://127.0.0.1:{port}", resolution="1HOUR")
+            stream.start()
+            try:
+                await test(stream, connections)
+            finally:
+                await stream.stop()
+    asyncio.run(main())
+
+async def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+def test_snapshot_fills_buffers():
+    async def test(stream, connections):
+        assert await stream.wait_ready(timeout=5)
+        for market in MARKETS:
+            closes = stream.get_closes(market)
+            assert len(closes) == 100
+            assert (closes > 0).all()
+    run_with_server(test)
+
+def test_updates_move_latest_close():
+    async def test(stream, connections):
+        assert await stream.wait_ready(timeout=5)
+        first = stream.get_closes("BTC-USD")
+        await wait_for(lambda: stream.get_closes("BTC-USD")[-1] != first[-1])
+        latest = stream.get_closes("BTC-USD")
+        assert len(latest) == 100
+        assert (latest[:-1] == first[:-1]).all()
+    run_with_server(test)
+
+def test_resubscribes_after_drop():
+    async def test(stream, connections):
+        assert await stream.wait_ready(timeout=5)
+        await connections[0].close()
+
+        # Buffers may have gaps while disconnected, so nothing is served until a fresh snapshot
+        await wait_for(lambda: stream.get_closes("BTC-USD") is None)
+        assert not stream.ready_event.is_set()
+
+        assert await stream.wait_ready(timeout=5)
+        assert len(connections) == 2
+        for market in MARKETS:
+            assert len(stream.get_closes(market)) == 100
+    run_with_server(test)
+
+def test_trades_only_update_the_latest_candle():
+    stream = PriceStream(["BTC-USD"], url="ws://unused", resolution="1HOUR")
+    candles = [
+        {"startedAt": "2024-07-01T11:00:00.000Z", "close": "10"},
+        {"startedAt": "2024-07-01T12:00:00.000Z", "close": "11"},
+    ]
+    stream.on_message({"type": "subscribed", "channel": "v4_candles", "id": "BTC-USD/1HOUR", "contents": {"candles": candles}})
+    trade = lambda price, at: {"type": "channel_data", "channel": "v4_trades", "id": "BTC-USD",
+                               "contents": {"trades": [{"price": price, "createdAt": at}]}}
+
+    stream.on_message(trade("12", "2024-07-01T12:30:00.000Z"))
+    assert list(stream.get_closes("BTC-USD")) == [10.0, 12.0]
+
+    # A trade outside the latest candle is ignored until that candle arrives
+    stream.on_message(trade("13", "2024-07-01T13:05:00.000Z"))
+    assert list(stream.get_closes("BTC-USD")) == [10.0, 12.0]
+    stream.on_message({"type": "channel_data", "channel": "v4_candles", "id": "BTC-USD/1HOUR",
+                       "contents": {"startedAt": "2024-07-01T13:00:00.000Z", "close": "13"}})
+    assert list(stream.get_closes("BTC-USD")) == [10.0, 12.0, 13.0]